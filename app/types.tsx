@@ -17,8 +17,10 @@ export type FileResult = {
   doc_type: string
   doc_role: "CORE_REQUIRED" | "SUPPORTING_OPTIONAL" | "IRRELEVANT"
   pages_processed: number
+  pages_total?: number
   fields: Record<string, any>
   rule: RuleResult
+  cache_hit?: boolean
 }
 
 export type AnalyzeResponse = {
@@ -1,15 +1,61 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any, Tuple, Optional
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from typing import List, Dict, Any, Tuple, Optional, Callable, Iterator
+import asyncio
+import contextvars
+import hashlib
+import hmac
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
 import time
 import re
 import io
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 import fitz  # PyMuPDF
+from python_multipart.multipart import MultipartParser, MultipartParseError, parse_options_header
 from PIL import Image, ImageOps, ImageEnhance
 import pytesseract
 
+try:
+    import tesserocr  # opsiyonel: Tesseract C API (subprocess/temp dosya yok)
+except ImportError:
+    tesserocr = None
+
+try:
+    import numpy as np  # opsiyonel: vektörel ön işleme
+except ImportError:
+    np = None
+
+try:
+    import ahocorasick  # opsiyonel: belge türü anahtar kelimeleri için tek geçiş
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson  # opsiyonel: hızlı JSON encode (yanıtlar, SSE)
+except ImportError:
+    orjson = None
+
+try:
+    import redis  # opsiyonel: süreçler/pod'lar arası paylaşılan sonuç önbelleği
+except ImportError:
+    redis = None
+
+try:
+    # opsiyonel: paylaşılan önbellekteki değerlerin şifrelenmesi
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+except ImportError:
+    AESGCM = None
+
 app = FastAPI()
 
 app.add_middleware(
@@ -25,9 +71,143 @@ app.add_middleware(
 # ----------------------------
 MAX_FILE_MB = 10
 ALLOWED_TYPES = {"application/pdf", "image/jpeg", "image/png", "image/webp"}
+# Tek istekteki dosya sayısı ve toplam gövde boyutu üst sınırı
+MAX_FILES_PER_REQUEST = int(os.getenv("MAX_FILES_PER_REQUEST", "10"))
+MAX_REQUEST_MB = float(os.getenv("MAX_REQUEST_MB", "50"))
 MAX_PDF_PAGES = 6
 OCR_DPI = 300
 
+# Render planı: "adaptive" (sayfa boyutu / gömülü tarama / metin yüksekliğine göre DPI) veya "fixed"
+OCR_RENDER_MODE = os.getenv("OCR_RENDER_MODE", "adaptive")
+OCR_MIN_DPI = 150
+OCR_PROBE_DPI = 96
+# Tesseract için hedef metin (mürekkep) yüksekliği, piksel: ~10pt @ 300 DPI;
+# Tesseract doğruluğu bunun altında hızla düşer
+OCR_TARGET_TEXT_PX = 32
+# Tek sayfa render'ı için piksel üst sınırı (~A4 @ 300 DPI)
+OCR_MAX_PAGE_PIXELS = 9_000_000
+# MRZ alt bandı: sayfanın alt %40'ı
+MRZ_BAND_TOP = 0.60
+
+# Bölge (ROI) OCR: düşük DPI yerleşim analiziyle metin blokları bulunur, yalnızca
+# onlar tek geçişte OCR'lanır; sonuç yetersizse tam sayfa geçişlerine dönülür (adaptive)
+OCR_ROI = os.getenv("OCR_ROI", "1") not in ("0", "false", "no")
+# Bloklar sayfanın bu oranından fazlasını kaplıyorsa (yoğun sayfa) tam sayfa OCR
+OCR_ROI_MAX_COVERAGE = float(os.getenv("OCR_ROI_MAX_COVERAGE", "0.6"))
+# Bölge sayısı için kesin üst sınır (asıl sınır motor maliyeti, bkz. OCR_CALL_COST_PX)
+OCR_ROI_MAX_REGIONS = int(os.getenv("OCR_ROI_MAX_REGIONS", "16"))
+# Motor çağrısı başına sabit maliyet, OCR'lanan piksel cinsinden (pytesseract: süreç
+# başlatma + dil modeli yükleme + görüntü yazma). Bölgeler ancak toplam maliyetleri
+# tek tam sayfa geçişinden düşükse kullanılır.
+OCR_CALL_COST_PX = {"pytesseract": 1_000_000, "tesserocr": 100_000}
+# Kelime / satır birleştirme boşlukları: ölçülen metin yüksekliğinin katı
+# (normal satır aralığında satırlar bloğa birleşir, boş satırla ayrılan paragraflar ayrı kalır)
+ROI_WORD_GAP = 2.0
+ROI_LINE_GAP = 2.0
+# Metin yüksekliği ölçülemezse (pt, ~11pt gövde metni)
+ROI_DEFAULT_TEXT_PT = 8.0
+ROI_PAD_PT = 3
+# Mürekkep oranı bunun üstündeki yüksek bloklar fotoğraf / logo sayılır, OCR'lanmaz
+ROI_IMAGE_DENSITY = 0.45
+
+# Render + ön işleme için süreç geneli bellek bütçesi (MB, 0 => sınırsız).
+# Sayfalar render edilmeden önce tahmini çalışma belleğini ayırır; bütçe doluysa bekler.
+OCR_MEMORY_BUDGET_MB = float(os.getenv("OCR_MEMORY_BUDGET_MB", "1024"))
+# Render pikseli başına tahmini tepe bellek (bayt): RGB pixmap (3) + gri / LUT ara
+# görüntüler ve uint16 smooth tamponları + önbellekteki binarize görüntüler.
+# sauvola float64 integral image'lar kullanır.
+OCR_BYTES_PER_PIXEL = {"fixed": 13, "otsu": 15, "sauvola": 48, "pil": 9}
+
+# Dijital PDF'lerde önce gömülü metin katmanı; kalite yetersizse OCR
+OCR_TEXT_LAYER = os.getenv("OCR_TEXT_LAYER", "1") not in ("0", "false", "no")
+TEXT_LAYER_MIN_CHARS = 100
+TEXT_LAYER_MAX_GARBAGE = 0.15
+
+# OCR geçiş stratejisi: "adaptive" (ucuz geçiş + gerekirse ek geçişler) veya "full"
+OCR_STRATEGY = os.getenv("OCR_STRATEGY", "adaptive")
+# Dil modu: "separate" (eng ve tur ayrı geçişler) veya "combined" (tek eng+tur geçişi)
+OCR_LANG_MODE = os.getenv("OCR_LANG_MODE", "separate")
+
+# Ön işleme: "numpy" (vektörel, numpy varsa) veya "pil" (ImageEnhance zinciri)
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "numpy")
+# Eşikleme: "fixed" (profil eşiği), "otsu" veya "sauvola" (yalnızca numpy ile)
+OCR_THRESHOLD = os.getenv("OCR_THRESHOLD", "fixed")
+SAUVOLA_WINDOW = 31
+SAUVOLA_K = 0.2
+
+# OCR motoru: "auto" (tesserocr varsa onu kullan), "tesserocr" veya "pytesseract"
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")
+
+# PDF sayfaları sırayla değerlendirilir; belge güvenle sınıflanıp zorunlu
+# alanları bulununca kalan sayfalar OCR'lanmaz
+OCR_EARLY_STOP = os.getenv("OCR_EARLY_STOP", "1") not in ("0", "false", "no")
+# Fan-out + erken durdurma: ilk sayfa tek başına, sonra en fazla bu kadar sayfa aynı anda
+OCR_EARLY_STOP_WINDOW = max(1, int(os.getenv("OCR_EARLY_STOP_WINDOW", "2")))
+
+# Önce MRZ bandı: TD3 MRZ check digit'leri tutarsa tam sayfa OCR atlanır
+OCR_MRZ_FIRST = os.getenv("OCR_MRZ_FIRST", "1") not in ("0", "false", "no")
+
+# ----------------------------
+# OCR worker havuzu (event loop'u bloklamamak için)
+# ----------------------------
+# "thread" (varsayılan) veya "process"
+OCR_POOL_KIND = os.getenv("OCR_POOL_KIND", "thread")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 2)))
+# Çalışan + kuyrukta bekleyen /analyze isteği üst sınırı; dolunca 429
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", str(OCR_WORKERS * 4)))
+# Bir isteğin tüm OCR işi için süre sınırı (saniye); aşılırsa 504
+OCR_TIMEOUT_S = float(os.getenv("OCR_TIMEOUT_S", "120"))
+OCR_RETRY_AFTER_S = int(os.getenv("OCR_RETRY_AFTER_S", "5"))
+# Fan-out: tek istekteki tüm dosya/sayfaları paralel OCR'la (0 => sıralı)
+OCR_FANOUT = os.getenv("OCR_FANOUT", "1") not in ("0", "false", "no")
+# Tek bir isteğin aynı anda kullanabileceği worker sayısı (adil paylaşım)
+OCR_REQUEST_PARALLELISM = int(os.getenv("OCR_REQUEST_PARALLELISM", str(OCR_WORKERS)))
+
+# ----------------------------
+# Sonuç önbelleği (tekrar yüklenen aynı dosyalar için)
+# ----------------------------
+# Girdi sayısı üst sınırı (0 => kapalı) ve yaşam süresi (saniye)
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", "900"))
+# Depo: "memory" (süreç içi), "sqlite" (aynı makinedeki worker'lar) veya "redis"
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory")
+# sqlite dosyası (varsayılan tmpfs) / redis URL'i
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "/dev/shm/schengen-precheck-cache.sqlite")
+RESULT_CACHE_URL = os.getenv("RESULT_CACHE_URL", "redis://127.0.0.1:6379/0")
+# Paylaşılan depo erişimi için üst sınır (bağlantı / soket / kilit bekleme); aşılırsa önbelleksiz devam
+RESULT_CACHE_TIMEOUT_S = float(os.getenv("RESULT_CACHE_TIMEOUT_S", "0.5"))
+# HMAC + şifreleme sırrı; verilmezse süreç başına rastgele (paylaşılan depolarda zorunlu)
+RESULT_CACHE_SECRET = os.getenv("RESULT_CACHE_KEY", "").encode()
+RESULT_CACHE_KEY = RESULT_CACHE_SECRET or os.urandom(32)
+# Analiz mantığı değişince artırılır; eski önbellek girdileri geçersiz olur
+ANALYSIS_VERSION = "1"
+
+# ----------------------------
+# Yanıt profili
+# ----------------------------
+# minimal: tür, alanlar, kural; standard: + sayfa/geçiş meta verisi, LLM önizlemesi;
+# debug: + ham OCR sayfa metni ve debug alanları. ?profile= ile istek başına seçilir.
+RESPONSE_PROFILE = os.getenv("RESPONSE_PROFILE", "standard")
+RESPONSE_PROFILES = ("minimal", "standard", "debug")
+
+# ----------------------------
+# Örnekleyen profiler (opsiyonel, varsayılan kapalı)
+# ----------------------------
+# Profillenecek /analyze isteği oranı (0 => kapalı, 0.05 => %5)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+# Bellekte tutulan farklı stack sayısı üst sınırı
+PROFILE_MAX_STACKS = int(os.getenv("PROFILE_MAX_STACKS", "5000"))
+# /admin/profile için X-Admin-Token; boşsa endpoint kapalı
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+
+# ----------------------------
+# Asenkron işler (/jobs)
+# ----------------------------
+# Aynı anda tutulan iş sayısı ve bitmiş işin saklanma süresi (saniye, yalnızca RAM)
+JOB_MAX = int(os.getenv("JOB_MAX", "100"))
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "600"))
+
 # Belge türü tespiti: güven eşiği (düşürüldü - daha hassas algılama için)
 CONFIDENCE_THRESHOLD = 2
 
@@ -37,10 +217,20 @@ CONFIDENCE_THRESHOLD = 2
 def _mb(n: int) -> float:
     return n / (1024 * 1024)
 
-def _safe_meta(f: UploadFile, size_mb: float) -> Dict[str, Any]:
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def rss_mb() -> Optional[float]:
+    # Anlık RSS (Linux /proc); başka platformlarda None
+    try:
+        with open("/proc/self/statm") as fh:
+            return round(_mb(int(fh.read().split()[1]) * _PAGE_SIZE), 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _safe_meta(filename: Optional[str], content_type: str, size_mb: float) -> Dict[str, Any]:
     return {
-        "filename": f.filename,
-        "content_type": (f.content_type or "").lower(),
+        "filename": filename,
+        "content_type": content_type,
         "size_mb": round(size_mb, 2),
     }
 
@@ -51,17 +241,629 @@ def normalize_text(t: str) -> str:
     t = re.sub(r"\n{3,}", "\n\n", t)
     return t.strip()
 
+# ----------------------------
+# Ölçüm: aşama süreleri (span) + Prometheus metrikleri
+# ----------------------------
+class StageTimings:
+    """
+    Aşama adı -> toplam süre (ms) ve çağrı sayısı. OCR worker'ında
+    (thread veya process) toplanır ve sayfa sonucuyla birlikte döner.
+    """
+
+    def __init__(self):
+        self.ms: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def add(self, name: str, ms: float, calls: int = 1) -> None:
+        self.ms[name] = self.ms.get(name, 0.0) + ms
+        self.calls[name] = self.calls.get(name, 0) + calls
+
+    def merge(self, timings: Dict[str, Dict[str, float]]) -> None:
+        for name, t in timings.items():
+            self.add(name, t["ms"], int(t["calls"]))
+
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {k: {"ms": round(v, 2), "calls": self.calls[k]} for k, v in self.ms.items()}
+
+
+_timing_local = threading.local()
+
+@contextmanager
+def collect_timings():
+    # Bu thread'deki stage() span'lerini yeni bir StageTimings'e topla (iç içe kullanılabilir)
+    prev = getattr(_timing_local, "timings", None)
+    timings = _timing_local.timings = StageTimings()
+    try:
+        yield timings
+    finally:
+        _timing_local.timings = prev
+
+@contextmanager
+def stage(name: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = getattr(_timing_local, "timings", None)
+        if timings is not None:
+            timings.add(name, (time.perf_counter() - t0) * 1000)
+
+
+def _label_str(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metric:
+    """
+    Prometheus metin formatında basit süreç içi metrik (bağımlılık yok).
+    Her uvicorn worker'ı kendi değerlerini raporlar.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        METRICS.append(self)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        head = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return "\n".join(head + self.samples())
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_label_str(k)} {v:g}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    # Değer scrape anında okunur (ör. kuyruk derinliği); kind="counter" monoton sayaçlar için
+    def __init__(self, name: str, help_text: str, read: Callable[[], float], kind: str = "gauge"):
+        super().__init__(name, help_text)
+        self._read = read
+        self.kind = kind
+
+    def samples(self) -> List[str]:
+        return [f"{self.name} {self._read():g}"]
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        super().__init__(name, help_text)
+        self.buckets = buckets
+        self._values: Dict[Tuple[Tuple[str, str], ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            # [bucket sayaçları..., +Inf, toplam]
+            v = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    v[i] += 1
+            v[-2] += 1
+            v[-1] += value
+
+    def samples(self) -> List[str]:
+        out: List[str] = []
+        with self._lock:
+            for key, v in sorted(self._values.items()):
+                for b, n in zip(self.buckets, v):
+                    out.append(f"{self.name}_bucket{_label_str(key + (('le', f'{b:g}'),))} {n:g}")
+                out.append(f"{self.name}_bucket{_label_str(key + (('le', '+Inf'),))} {v[-2]:g}")
+                out.append(f"{self.name}_sum{_label_str(key)} {v[-1]:.6f}")
+                out.append(f"{self.name}_count{_label_str(key)} {v[-2]:g}")
+        return out
+
+
+METRICS: List[Metric] = []
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+M_FILES = Counter("schengen_files_total", "Analyzed files by doc_type and cache result")
+M_PAGES = Counter("schengen_pages_total", "Processed PDF/image pages by extraction method")
+M_PAGES_SKIPPED = Counter("schengen_pages_skipped_total", "PDF pages skipped by early stop")
+M_TESSERACT_CALLS = Counter("schengen_tesseract_calls_total", "OCR engine calls")
+M_INGESTED_BYTES = Counter("schengen_ingested_bytes_total", "Request body bytes read by upload streaming")
+M_REJECTED = Counter("schengen_rejected_total", "Rejected requests by HTTP status")
+M_STAGE_SECONDS = Histogram(
+    "schengen_stage_seconds", "Per-file time spent in each pipeline stage", _SECONDS_BUCKETS
+)
+M_REQUEST_SECONDS = Histogram(
+    "schengen_request_seconds", "End-to-end request duration by endpoint", _SECONDS_BUCKETS
+)
+# Değerler scrape anında okunur (OCR_POOL / RESULT_CACHE / JOBS aşağıda tanımlı)
+Gauge("schengen_ocr_pending_requests", "Admitted requests holding an OCR pool slot", lambda: OCR_POOL.pending)
+Gauge("schengen_ocr_max_pending_requests", "OCR pool admission limit", lambda: OCR_POOL.max_pending)
+Gauge("schengen_ocr_workers", "OCR pool workers", lambda: OCR_POOL.workers)
+Gauge("schengen_cache_hits_total", "Result cache hits", lambda: RESULT_CACHE.hits, kind="counter")
+Gauge("schengen_cache_misses_total", "Result cache misses", lambda: RESULT_CACHE.misses, kind="counter")
+Gauge("schengen_jobs", "Jobs held in memory", lambda: len(JOBS))
+Gauge("schengen_pixel_budget_bytes", "Render/preprocess memory budget", lambda: PIXEL_BUDGET.capacity)
+Gauge("schengen_pixel_budget_used_bytes", "Reserved render/preprocess memory", lambda: PIXEL_BUDGET.used)
+Gauge("schengen_pixel_budget_waiting", "Pages waiting for render memory", lambda: PIXEL_BUDGET.waiting)
+
+
+def render_metrics() -> str:
+    return "\n".join(m.render() for m in METRICS) + "\n"
+
+
+# Örneklenen isteğin bağlamı; bu bağlamdan havuza gönderilen işler izlenir
+_PROFILED: contextvars.ContextVar[bool] = contextvars.ContextVar("profiled", default=False)
+
+
+class SamplingProfiler:
+    """
+    Örneklenen istekler sürerken event loop thread'lerinin ve o isteklerin
+    işlerini o anda çalıştıran OCR worker thread'lerinin (run_worker) stack'lerini
+    PROFILE_INTERVAL_MS aralıkla okur (sys._current_frames). Diğer isteklerin
+    havuz işleri örneklenmez; event loop tüm isteklerce paylaşıldığı için örneklenir.
+    Yalnızca kod konumu (dosya:fonksiyon) tutulur; argüman, yerel değişken
+    veya belge içeriği okunmaz (KVKK-safe). Çıktı flame graph'ların
+    beklediği "folded" formatındadır: "kök;...;yaprak sayı".
+    Process havuzundaki worker'lar örneklenmez.
+    """
+
+    def __init__(self, rate: float, interval_s: float, max_stacks: int, max_depth: int = 64):
+        self.rate = rate
+        self.interval_s = interval_s
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self._cond = threading.Condition()
+        self._active = 0
+        self._loop_threads: Dict[int, int] = {}
+        self._worker_threads: Dict[int, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self.dropped = 0
+        self.requests = 0
+
+    def should_sample(self) -> bool:
+        return self.rate > 0 and random.random() < self.rate
+
+    def profiling(self) -> bool:
+        # Çağıran görev örneklenen bir isteğe mi ait (PROFILER.request() içinden)
+        return _PROFILED.get()
+
+    def run_worker(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # Havuz thread'inde: iş sürdükçe bu thread örneklenir
+        ident = threading.get_ident()
+        with self._cond:
+            self._worker_threads[ident] = self._worker_threads.get(ident, 0) + 1
+        try:
+            return fn(*args)
+        finally:
+            with self._cond:
+                self._worker_threads[ident] -= 1
+                if not self._worker_threads[ident]:
+                    del self._worker_threads[ident]
+
+    @contextmanager
+    def request(self):
+        loop_ident = threading.get_ident()
+        token = _PROFILED.set(True)
+        with self._cond:
+            self._active += 1
+            self.requests += 1
+            self._loop_threads[loop_ident] = self._loop_threads.get(loop_ident, 0) + 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        try:
+            yield
+        finally:
+            _PROFILED.reset(token)
+            with self._cond:
+                self._active -= 1
+                self._loop_threads[loop_ident] -= 1
+                if not self._loop_threads[loop_ident]:
+                    del self._loop_threads[loop_ident]
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._active:
+                    self._cond.wait()
+                loop_threads = set(self._loop_threads)
+                worker_threads = set(self._worker_threads)
+            self._sample(loop_threads, worker_threads)
+            time.sleep(self.interval_s)
+
+    def _folded(self, root: str, frame) -> str:
+        parts: List[str] = []
+        while frame is not None and len(parts) < self.max_depth:
+            code = frame.f_code
+            parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        parts.append(root)
+        return ";".join(reversed(parts))
+
+    def _sample(self, loop_threads: set, worker_threads: set) -> None:
+        folded: List[str] = []
+        for ident, frame in sys._current_frames().items():
+            if ident in loop_threads:
+                folded.append(self._folded("event-loop", frame))
+            elif ident in worker_threads:
+                folded.append(self._folded("ocr-worker", frame))
+        del frame
+        with self._cond:
+            self.samples += 1
+            for key in folded:
+                if key in self.stacks:
+                    self.stacks[key] += 1
+                elif len(self.stacks) < self.max_stacks:
+                    self.stacks[key] = 1
+                else:
+                    self.dropped += 1
+
+    def folded(self) -> str:
+        with self._cond:
+            items = sorted(self.stacks.items(), key=lambda kv: -kv[1])
+        return "".join(f"{k} {v}\n" for k, v in items)
+
+    def summary(self, top: int = 50) -> Dict[str, Any]:
+        with self._cond:
+            items = sorted(self.stacks.items(), key=lambda kv: -kv[1])[:top]
+            return {
+                "sample_rate": self.rate,
+                "interval_ms": self.interval_s * 1000,
+                "requests_sampled": self.requests,
+                "active": self._active,
+                "samples": self.samples,
+                "distinct_stacks": len(self.stacks),
+                "dropped": self.dropped,
+                "top": [{"stack": k, "count": v} for k, v in items],
+            }
+
+    def reset(self) -> None:
+        with self._cond:
+            self.stacks.clear()
+            self.samples = self.dropped = self.requests = 0
+
+
+PROFILER = SamplingProfiler(PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS / 1000, PROFILE_MAX_STACKS)
+
+# ----------------------------
+# MRZ (ICAO 9303 TD3 - pasaport, 2 x 44 karakter)
+# ----------------------------
+MRZ_LINE_LEN = 44
+# OCR'ın MRZ filler'ı için ürettiği yaygın karakterler
+_MRZ_FILLER_FIXES = str.maketrans({"«": "<", "‹": "<", "(": "<", "[": "<", "{": "<"})
+# Yalnızca rakam olması gereken alanlarda OCR harf/rakam karışıklıkları
+_MRZ_DIGIT_FIXES = str.maketrans("OQDILZSBG", "000112586")
+_MRZ_LINE_RE = re.compile(r"^[A-Z0-9<]+$")
+
+
+def mrz_char_value(c: str) -> int:
+    if c.isdigit():
+        return int(c)
+    if "A" <= c <= "Z":
+        return ord(c) - 55
+    return 0  # "<"
+
+
+def mrz_check_digit(field: str) -> int:
+    # ICAO 9303: 7-3-1 ağırlıklı toplam mod 10
+    weights = (7, 3, 1)
+    return sum(mrz_char_value(c) * weights[i % 3] for i, c in enumerate(field)) % 10
+
+
+def _mrz_check(field: str, digit: str) -> bool:
+    # Boş opsiyonel alanda check digit "<" olabilir
+    if digit == "<":
+        return field.strip("<") == ""
+    return digit.isdigit() and mrz_check_digit(field) == int(digit)
+
+
+def _mrz_date(yymmdd: str, kind: str) -> Optional[datetime]:
+    if not yymmdd.isdigit():
+        return None
+    yy, mm, dd = int(yymmdd[:2]), int(yymmdd[2:4]), int(yymmdd[4:])
+    now = datetime.now()
+    if kind == "birth":
+        year = 1900 + yy if 2000 + yy > now.year else 2000 + yy
+    else:
+        # Geçerlilik: en fazla ~20 yıl ileri
+        year = 2000 + yy if 2000 + yy <= now.year + 20 else 1900 + yy
+    return _make_date(year, mm, dd)
+
+
+def _mrz_clean(line: str) -> str:
+    return "".join(line.split()).upper().translate(_MRZ_FILLER_FIXES)
+
+
+def parse_td3_mrz(line2: str, line1: Optional[str] = None) -> Dict[str, Any]:
+    """
+    TD3 2. satırı (+ varsa 1. satır) ayrıştırır ve check digit'leri doğrular.
+    2. satır: belge no(9)+cd, uyruk(3), doğum(6)+cd, cinsiyet, geçerlilik(6)+cd,
+    opsiyonel(14)+cd, bileşik cd.
+    İsimler (1. satır) okunmaz; yalnızca belge tipi ve veren devlet alınır.
+    """
+    l2 = line2[:MRZ_LINE_LEN].ljust(MRZ_LINE_LEN, "<")
+    # Sayısal alanlarda O->0, I->1 vb. düzeltme (check digit sonra doğrular)
+    digits = lambda a, b: l2[a:b].translate(_MRZ_DIGIT_FIXES)
+    doc_no, doc_cd = l2[0:9], digits(9, 10)
+    birth, birth_cd = digits(13, 19), digits(19, 20)
+    expiry, expiry_cd = digits(21, 27), digits(27, 28)
+    optional, optional_cd = l2[28:42], digits(42, 43)
+    composite_cd = digits(43, 44)
+    composite = doc_no + doc_cd + birth + birth_cd + expiry + expiry_cd + optional + optional_cd
+
+    checks = {
+        "document_number": _mrz_check(doc_no, doc_cd),
+        "birth_date": _mrz_check(birth, birth_cd),
+        "expiry_date": _mrz_check(expiry, expiry_cd),
+        "optional_data": _mrz_check(optional, optional_cd),
+        "composite": _mrz_check(composite, composite_cd),
+    }
+    out: Dict[str, Any] = {
+        "format": "TD3",
+        "document_type": None,
+        "issuing_state": None,
+        "document_number": doc_no.rstrip("<"),
+        "nationality": l2[10:13].replace("<", ""),
+        "birth_date": _mrz_date(birth, "birth"),
+        "sex": l2[20] if l2[20] in "MF" else None,
+        "expiry_date": _mrz_date(expiry, "expiry"),
+        "checks": checks,
+        "valid": all(checks.values()),
+    }
+    if line1 and line1.startswith("P"):
+        out["document_type"] = line1[:2].rstrip("<")
+        out["issuing_state"] = line1[2:5].replace("<", "")
+    return out
+
+
+def find_td3_mrz(text: str) -> Optional[Dict[str, Any]]:
+    """
+    OCR metninde TD3 MRZ arar. Satırlar boşluksuz/büyük harfe çevrilir;
+    ~44 karakterlik MRZ karakter kümesi satırları 2. satır adayıdır
+    (OCR iki satırı birleştirdiyse 88 karakter bölünür).
+    En çok check digit'i tutan aday döner; hiçbiri belge no/geçerlilik
+    check'ini geçmiyorsa None.
+    """
+    lines = [_mrz_clean(ln) for ln in text.splitlines()]
+    lines = [ln for ln in lines if len(ln) >= 30 and _MRZ_LINE_RE.match(ln)]
+
+    candidates: List[Tuple[str, Optional[str]]] = []
+    for i, ln in enumerate(lines):
+        if len(ln) >= 2 * MRZ_LINE_LEN - 4 and ln.startswith("P"):
+            half = len(ln) // 2
+            candidates.append((ln[half:], ln[:half]))
+        elif MRZ_LINE_LEN - 4 <= len(ln) <= MRZ_LINE_LEN + 4:
+            prev = lines[i - 1] if i > 0 else None
+            candidates.append((ln, prev))
+
+    best = None
+    for line2, line1 in candidates:
+        parsed = parse_td3_mrz(line2, line1)
+        if parsed["valid"]:
+            return parsed
+        checks = parsed["checks"]
+        if not (checks["document_number"] and checks["expiry_date"]):
+            continue
+        if best is None or sum(checks.values()) > sum(best["checks"].values()):
+            best = parsed
+    return best
+
+
+def mrz_summary(mrz: Dict[str, Any]) -> Dict[str, Any]:
+    # Yanıta giden KVKK-safe özet: belge no ve doğum tarihi yok
+    return {
+        "valid": mrz["valid"],
+        "issuing_state": mrz["issuing_state"],
+        "nationality": mrz["nationality"],
+        "expiry_date": mrz["expiry_date"].date().isoformat() if mrz["expiry_date"] else None,
+        "checks": mrz["checks"],
+    }
+
+
+# ----------------------------
+# OCR motorları (pluggable)
+# ----------------------------
+class OcrEngine:
+    """
+    OCR backend arayüzü: PIL görüntüsü + (lang, psm) -> metin.
+    """
+    name = "base"
+
+    def image_to_string(self, img: Image.Image, lang: str, psm: int) -> str:
+        raise NotImplementedError
+
+
+class PytesseractEngine(OcrEngine):
+    """
+    Fallback: her çağrıda tesseract süreci başlatır (traineddata + temp dosya).
+    """
+    name = "pytesseract"
+
+    def image_to_string(self, img: Image.Image, lang: str, psm: int) -> str:
+        return pytesseract.image_to_string(img, lang=lang, config=f"--oem 3 --psm {psm}")
+
+
+class TesserocrEngine(OcrEngine):
+    """
+    Tesseract C API (tesserocr). (lang, psm) başına ilk çağrıda bir kez
+    başlatılan handle'lar thread-local tutulur; model yükleme ve süreç
+    başlatma worker başına bir kez olur. Handle'lar thread-safe değildir.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _api(self, lang: str, psm: int):
+        apis = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        api = apis.get((lang, psm))
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm, oem=tesserocr.OEM.DEFAULT)
+            apis[(lang, psm)] = api
+        return api
+
+    def image_to_string(self, img: Image.Image, lang: str, psm: int) -> str:
+        api = self._api(lang, psm)
+        # Ham piksel tamponu (SetImage'ın dahili BMP/PNG encode'u olmadan)
+        if img.mode not in ("L", "RGB"):
+            img = img.convert("L")
+        bpp = 1 if img.mode == "L" else 3
+        try:
+            api.SetImageBytes(img.tobytes(), img.width, img.height, bpp, bpp * img.width)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+
+_ocr_engine: Optional[OcrEngine] = None
+_ocr_engine_lock = threading.Lock()
+
+def get_ocr_engine() -> OcrEngine:
+    """
+    Süreç başına tek OCR motoru (OCR_ENGINE ayarına göre seçilir).
+    """
+    global _ocr_engine
+    if _ocr_engine is None:
+        with _ocr_engine_lock:
+            if _ocr_engine is None:
+                if OCR_ENGINE == "pytesseract" or (OCR_ENGINE == "auto" and tesserocr is None):
+                    _ocr_engine = PytesseractEngine()
+                elif tesserocr is None:
+                    raise RuntimeError("OCR_ENGINE=tesserocr but tesserocr is not installed")
+                else:
+                    _ocr_engine = TesserocrEngine()
+    return _ocr_engine
+
 # ----------------------------
 # OCR (RAM only)
 # ----------------------------
-def ocr_image_bytes(img_bytes: bytes, lang: str = "eng") -> str:
+def _smooth3x3(a):
+    # ImageFilter.SMOOTH ([[1,1,1],[1,5,1],[1,1,1]] / 13, yuvarlamalı); kenar pikselleri PIL gibi kopyalanır
+    w = a.astype(np.uint16)
+    rows = w[:, :-2] + w[:, 1:-1]
+    rows += w[:, 2:]
+    inner = rows[:-2] + rows[1:-1]
+    inner += rows[2:]
+    del rows
+    inner += w[1:-1, 1:-1] << 2
+    inner <<= 1
+    inner += 13
+    inner //= 26
+    out = a.copy()
+    out[1:-1, 1:-1] = inner
+    return out
+
+def _blend_lut(base, image, factor: float):
+    # ImageEnhance / Image.blend: base + factor * (image - base), float32, kırp + truncate
+    out = base + np.float32(factor) * (image - base)
+    return np.trunc(np.clip(out, 0, 255)).astype(np.uint8)
+
+def _otsu_threshold(a) -> float:
+    hist = np.bincount(a.astype(np.uint8).ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256, dtype=np.float64)
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(hist * levels)
+    mt = m0[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (mt * w0 / w0[-1] - m0) ** 2 / (w0 * w1)
+    return float(np.nanargmax(between[:-1]) + 1)
+
+def _sauvola_threshold(a, window: int = SAUVOLA_WINDOW, k: float = SAUVOLA_K):
+    # Integral image ile yerel ortalama / std (pencere başına O(1))
+    r = window // 2
+    p = np.pad(a.astype(np.float64), r + 1, mode="edge")
+    s1 = p.cumsum(0).cumsum(1)
+    s2 = (p * p).cumsum(0).cumsum(1)
+    h, w = a.shape
+
+    def box(s):
+        return (s[window:window + h, window:window + w] - s[:h, window:window + w]
+                - s[window:window + h, :w] + s[:h, :w])
+
+    n = float(window * window)
+    mean = box(s1) / n
+    std = np.sqrt(np.maximum(box(s2) / n - mean * mean, 0.0))
+    return mean * (1.0 + k * (std / 128.0 - 1.0))
+
+def enhance_and_threshold_np(
+    gray: Image.Image,
+    contrast: float,
+    sharpness: float,
+    brightness: float,
+    threshold: int,
+    method: str = "fixed",
+) -> Image.Image:
+    """
+    Contrast -> Sharpness -> Brightness -> threshold zincirinin NumPy karşılığı.
+    Nokta işlemleri lookup tablolarına katlanır; tek uzamsal adım tamsayı SMOOTH'tur.
+    Sabit eşikte her smooth değeri için "geçen en küçük piksel" tablosu kurulur
+    ve zincir tek bir dizi karşılaştırmasına iner.
+    Sabit eşikte PIL zinciriyle birebir aynı sonucu üretir.
+    """
+    levels = np.arange(256, dtype=np.float32)
+
+    # Contrast: ortalama gri etrafında ölçekle (ImageStat ortalaması, yuvarlanmış)
+    g = np.asarray(gray)
+    mean = np.float32(int(int(g.sum(dtype=np.uint64)) / g.size + 0.5))
+    del g
+    x = np.asarray(gray.point(_blend_lut(mean, levels, contrast).tolist()))
+
+    # Sharpness (SMOOTH ile blend) + Brightness (siyah ile blend): lut[x, smooth]
+    smooth = _smooth3x3(x)
+    sharp = _blend_lut(levels[None, :], levels[:, None], sharpness)
+    lut = _blend_lut(np.float32(0), sharp.astype(np.float32), brightness)
+
+    if method == "fixed":
+        # lut x'e göre monoton: smooth değeri s için eşiği geçen en küçük x
+        passing = lut >= threshold
+        min_x = np.where(passing.any(axis=0), passing.argmax(axis=0), 256)
+        smooth_img = Image.fromarray(smooth)
+        mask = x >= np.asarray(smooth_img.point(np.minimum(min_x, 255).tolist()))
+        if (min_x > 255).any():
+            mask &= np.asarray(smooth_img.point((min_x <= 255).astype(np.uint8).tolist())) > 0
+    else:
+        idx = x.astype(np.uint16)
+        idx <<= 8
+        idx |= smooth
+        a = lut.ravel()[idx]
+        del idx
+        t = _otsu_threshold(a) if method == "otsu" else _sauvola_threshold(a)
+        mask = a >= t
+    return Image.fromarray(mask)
+
+def _use_numpy_preprocess() -> bool:
+    return OCR_PREPROCESS == "numpy" and np is not None
+
+def preprocess_for_ocr(img: Image.Image) -> Image.Image:
     """
     İyileştirilmiş OCR - pasaport ve belgeler için daha iyi sonuç
     """
-    img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-
     # Preprocess (pasaport/MRZ için kritik)
     gray = ImageOps.grayscale(img)
+
+    if _use_numpy_preprocess():
+        return enhance_and_threshold_np(gray, 3.0, 2.5, 1.1, 130, OCR_THRESHOLD)
     
     # Daha iyi kontrast ayarı (artırıldı)
     gray = ImageEnhance.Contrast(gray).enhance(3.0)
@@ -69,107 +871,1095 @@ def ocr_image_bytes(img_bytes: bytes, lang: str = "eng") -> str:
     gray = ImageEnhance.Brightness(gray).enhance(1.1)
     
     # Daha esnek threshold (140 yerine 130 - daha hassas)
-    gray = gray.point(lambda x: 0 if x < 130 else 255, "1")
-
-    # Pasaport için özel PSM modu (tek blok uniform text)
-    # PSM 6: tek uniform text bloğu (pasaport sayfası için ideal)
-    # PSM 11: sparse text (MRZ için daha iyi)
-    # PSM 3: otomatik sayfa segmentasyonu (daha genel)
-    config1 = "--oem 3 --psm 6"
-    text1 = pytesseract.image_to_string(gray, lang=lang, config=config1)
-    
-    # MRZ için alternatif PSM denemesi
-    config2 = "--oem 3 --psm 11"
-    text2 = pytesseract.image_to_string(gray, lang=lang, config=config2)
-    
-    # Otomatik segmentasyon denemesi
-    config3 = "--oem 3 --psm 3"
-    text3 = pytesseract.image_to_string(gray, lang=lang, config=config3)
-    
-    # Üç sonucu birleştir (daha fazla metin yakalama)
-    return text1 + "\n" + text2 + "\n" + text3
+    return gray.point(lambda x: 0 if x < 130 else 255, "1")
 
-def ocr_pdf_bytes(pdf_bytes: bytes, max_pages: int = MAX_PDF_PAGES):
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    pages = min(len(doc), max_pages)
+def preprocess_mrz_band(img: Image.Image) -> Image.Image:
+    # MRZ için alt bant (pasaport yakalama oranını çok artırır)
+    w, h = img.size
+
+    # Alt %40'ı al (daha geniş MRZ bölgesi)
+    return preprocess_mrz(img.crop((0, int(h * MRZ_BAND_TOP), w, h)))
+
+def preprocess_mrz(mrz_crop: Image.Image) -> Image.Image:
+    # MRZ için özel preprocessing (kırpılmış bant üzerinde)
+    mrz_gray = ImageOps.grayscale(mrz_crop)
+
+    if _use_numpy_preprocess():
+        return enhance_and_threshold_np(mrz_gray, 3.0, 3.0, 1.0, 120, OCR_THRESHOLD)
+
+    mrz_gray = ImageEnhance.Contrast(mrz_gray).enhance(3.0)
+    mrz_gray = ImageEnhance.Sharpness(mrz_gray).enhance(3.0)
+    return mrz_gray.point(lambda x: 0 if x < 120 else 255, "1")  # Daha düşük threshold MRZ için
+
+# Ön işleme profilleri: geçiş bölgesi -> binarize görüntü üreten fonksiyon
+PREPROCESS_PROFILES: Dict[str, Callable[[Image.Image], Image.Image]] = {
+    "page": preprocess_for_ocr,
+    "mrz": preprocess_mrz_band,
+    # Ayrı (yüksek DPI) render edilmiş MRZ bandı
+    "mrz_clip": preprocess_mrz,
+}
+
+
+class PreprocessCache:
+    """
+    İş kapsamlı ön işleme önbelleği: (sayfa, profil) -> binarize görüntü.
+    Aynı sayfanın tüm PSM/dil geçişleri tek ön işlenmiş görüntüyü paylaşır.
+    Yalnızca RAM; `with` bloğu bitince görüntüler kapatılır (KVKK no-persist).
+    """
+
+    def __init__(self):
+        self._items: Dict[Tuple[Any, str], Image.Image] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, page_key: Any, profile: str, img: Image.Image) -> Image.Image:
+        key = (page_key, profile)
+        out = self._items.get(key)
+        if out is None:
+            self.misses += 1
+            with stage("preprocess"):
+                out = self._items[key] = PREPROCESS_PROFILES[profile](img)
+        else:
+            self.hits += 1
+        return out
+
+    def has(self, page_key: Any, profile: str) -> bool:
+        return (page_key, profile) in self._items
+
+    def drop(self, page_key: Any) -> None:
+        # Sayfa bitince görüntülerini hemen bırak (bellek bütçesi serbest kalmadan önce)
+        for key in [k for k in self._items if k[0] == page_key]:
+            self._items.pop(key).close()
+
+    def clear(self) -> None:
+        for im in self._items.values():
+            im.close()
+        self._items.clear()
+
+    def __enter__(self) -> "PreprocessCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.clear()
+
+
+# Havuzda çalışan işin bağlamı (worker thread'i başına): isteğin kalan süresi
+# ve iptal bayrağı. run_pool_job kurar; PixelBudget beklemesi buna göre sınırlanır.
+_WORK = threading.local()
 
-    page_texts = []
 
-    for i in range(pages):
-        page = doc[i]
-        pix = page.get_pixmap(dpi=OCR_DPI)
-        img_bytes = pix.tobytes("png")
+def run_pool_job(deadline: float, cancelled: Optional[threading.Event], fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    Havuz işi sarmalayıcısı. deadline: time.time() cinsinden isteğin bitiş anı
+    (process havuzunda da geçerli). cancelled: yalnızca thread havuzunda; iş
+    beklenmez olunca (timeout / erken durdurma / iş iptali) set edilir.
+    """
+    _WORK.deadline, _WORK.cancelled = deadline, cancelled
+    try:
+        return fn(*args)
+    finally:
+        _WORK.deadline = _WORK.cancelled = None
+
+
+def work_remaining() -> float:
+    # Havuz dışında (ör. bench / testler) OCR_TIMEOUT_S
+    deadline = getattr(_WORK, "deadline", None)
+    if deadline is None:
+        return OCR_TIMEOUT_S
+    return max(0.0, deadline - time.time())
+
+
+def work_cancelled() -> bool:
+    cancelled = getattr(_WORK, "cancelled", None)
+    return cancelled is not None and cancelled.is_set()
+
 
-        # 1) Full page OCR - İngilizce + Türkçe (Türk pasaportları için)
-        text_full_eng = ocr_image_bytes(img_bytes, lang="eng")
+class PixelBudget:
+    """
+    Render + ön işleme için süreç geneli bellek bütçesi (bayt cinsinden semafor).
+    Her sayfa/görüntü işlenmeden önce tahmini çalışma belleğini ayırır; bütçe
+    doluysa diğer sayfalar bırakana kadar bekler (tüm istekler arasında).
+    Tek başına bütçeyi aşan sayfa bütçenin tamamını alır ve yalnız çalışır.
+    Process havuzunda her worker kendi bütçesini tutar.
+    """
+
+    def __init__(self, capacity_bytes: int):
+        self.capacity = max(0, capacity_bytes)
+        self.used = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def wake(self) -> None:
+        # İptal edilen işlerin beklemesini hemen bitirmek için
+        with self._cond:
+            self._cond.notify_all()
+
+    @contextmanager
+    def reserve(self, nbytes: int, timeout_s: Optional[float] = None):
+        """
+        Dönen sözlük sayfanın "memory" raporudur (reserved_mb; çağıran rss_mb ekler).
+        Bekleme süresi "memory_wait" aşamasına yazılır. timeout_s verilmezse
+        isteğin kalan süresi (work_remaining) kullanılır; bu sürede yer açılmazsa
+        veya istek iptal edilmişse asyncio.TimeoutError (istek timeout'u gibi 504).
+        """
+        lease: Dict[str, Any] = {"reserved_mb": round(_mb(nbytes), 1)}
+        n = min(nbytes, self.capacity)
+        if work_cancelled():
+            raise asyncio.TimeoutError()
+        if n <= 0:
+            yield lease
+            return
+        if timeout_s is None:
+            timeout_s = work_remaining()
+        with stage("memory_wait"), self._cond:
+            self.waiting += 1
+            try:
+                self._cond.wait_for(
+                    lambda: work_cancelled() or self.used + n <= self.capacity, timeout_s
+                )
+            finally:
+                self.waiting -= 1
+            if work_cancelled() or self.used + n > self.capacity:
+                raise asyncio.TimeoutError()
+            self.used += n
         try:
-            text_full_tur = ocr_image_bytes(img_bytes, lang="tur")
-        except:
-            text_full_tur = ""
-        
-        text_full = text_full_eng + "\n" + text_full_tur
+            yield lease
+        finally:
+            with self._cond:
+                self.used -= n
+                self._cond.notify_all()
 
-        # 2) MRZ için alt bant OCR (pasaport yakalama oranını çok artırır)
-        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
-        w, h = img.size
-        
-        # Alt %40'ı al (daha geniş MRZ bölgesi)
-        mrz_crop = img.crop((0, int(h * 0.60), w, h))
-        
-        # MRZ için özel preprocessing
-        mrz_gray = ImageOps.grayscale(mrz_crop)
-        mrz_gray = ImageEnhance.Contrast(mrz_gray).enhance(3.0)
-        mrz_gray = ImageEnhance.Sharpness(mrz_gray).enhance(3.0)
-        mrz_gray = mrz_gray.point(lambda x: 0 if x < 120 else 255, "1")  # Daha düşük threshold MRZ için
-
-        buf = io.BytesIO()
-        mrz_gray.save(buf, format="PNG")
-        
-        # MRZ için özel PSM modu
-        mrz_img = Image.open(io.BytesIO(buf.getvalue()))
-        mrz_config = "--oem 3 --psm 11"  # Sparse text için
-        text_mrz = pytesseract.image_to_string(mrz_img, lang="eng", config=mrz_config)
 
-        text = text_full + "\n" + text_mrz
+PIXEL_BUDGET = PixelBudget(int(OCR_MEMORY_BUDGET_MB * 1024 * 1024))
+
+
+def page_work_bytes(pixels: float) -> int:
+    # Render edilecek piksel sayısından tahmini tepe çalışma belleği
+    per_px = OCR_BYTES_PER_PIXEL.get(OCR_THRESHOLD if _use_numpy_preprocess() else "pil", 13)
+    return int(pixels * per_px)
+
+
+def render_pixels(rect, dpi: float, fraction: float = 1.0) -> float:
+    return (rect.width / 72.0 * dpi) * (rect.height / 72.0 * dpi) * fraction
+
+
+# OCR geçişleri: (bölge, dil, psm)
+# PSM 6: tek uniform text bloğu (pasaport sayfası için ideal)
+# PSM 11: sparse text (MRZ için daha iyi)
+# PSM 3: otomatik sayfa segmentasyonu (daha genel)
+OCR_PASS_PLAN_FULL: List[Tuple[str, str, int]] = [
+    ("page", "eng", 6), ("page", "eng", 11), ("page", "eng", 3),
+    ("page", "tur", 6), ("page", "tur", 11), ("page", "tur", 3),
+    ("mrz", "eng", 11),
+]
+# Adaptive: ucuz ve en bilgi verici geçişler önce
+OCR_PASS_PLAN_ADAPTIVE: List[Tuple[str, str, int]] = [
+    ("page", "eng", 6), ("mrz", "eng", 11), ("page", "tur", 6),
+    ("page", "eng", 11), ("page", "eng", 3),
+    ("page", "tur", 11), ("page", "tur", 3),
+]
+
+# Adaptive modda ek geçişleri durduran zorunlu alanlar (rule_engine'in baktıkları).
+# Pasaport: expiry_candidate her tarihe düşebildiği için (en büyük tarih yedeği)
+# yalnızca MRZ check digit'i tutan veya keyword'e bağlı bir geçerlilik yeterli sayılır.
+OCR_REQUIRED_FIELDS: Dict[str, List[str]] = {
+    "passport": ["expiry_anchored"],
+    "bank_statement": ["latest_date", "has_iban_term"],
+    "travel_insurance": ["min_date", "max_date", "has_schengen_term", "has_coverage_30k"],
+    "flight_reservation": ["min_date"],
+    "accommodation": ["min_date"],
+    "application_form": ["min_date"],
+}
+
+def ocr_pass_plan() -> List[Tuple[str, str, int]]:
+    """
+    OCR_STRATEGY + OCR_LANG_MODE için geçiş listesi.
+    combined: sayfa geçişleri tek "eng+tur" modeliyle, PSM başına bir kez
+    (MRZ bandı OCR-B / Latin olduğu için eng kalır).
+    """
+    plan = OCR_PASS_PLAN_ADAPTIVE if OCR_STRATEGY == "adaptive" else OCR_PASS_PLAN_FULL
+    if OCR_LANG_MODE != "combined":
+        return plan
+    out: List[Tuple[str, str, int]] = []
+    for region, lang, psm in plan:
+        if region == "page":
+            lang = "eng+tur"
+        if (region, lang, psm) not in out:
+            out.append((region, lang, psm))
+    return out
+
+def dedupe_lines(texts: List[str]) -> str:
+    # Geçişler arası tekrar eden satırları at (ilk görülen sıra korunur)
+    seen = set()
+    out: List[str] = []
+    for text in texts:
+        for line in text.splitlines():
+            key = " ".join(line.split()).lower()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            out.append(line)
+    return "\n".join(out)
+
+def ocr_text_sufficient(text: str) -> bool:
+    """
+    Adaptive zamanlama: metin güvenle sınıflandı mı ve
+    o türün zorunlu alanları bulundu mu?
+    """
+    scores = score_doc_types(text)
+    best = max(scores, key=scores.get)
+    if scores[best] < CONFIDENCE_THRESHOLD:
+        return False
+    required = OCR_REQUIRED_FIELDS.get(best, [])
+    if not required:
+        return True
+    fields = extract_fields_by_type(best, text, [])
+    return all(fields.get(k) for k in required)
+
+def document_complete(pages: List[Dict[str, Any]]) -> bool:
+    """
+    Sayfa bazlı erken durdurma: o ana kadarki sayfalar belgeyi sınıflamaya
+    ve türünün zorunlu alanlarını bulmaya yetiyor mu?
+    """
+    return ocr_text_sufficient("\n".join(p["text"] for p in pages))
+
+def ocr_pass_text(engine: OcrEngine, img: Image.Image, lang: str, psm: int) -> Tuple[Optional[str], str]:
+    """
+    Tek OCR geçişi, dil paketi eksikse düşüşle: "eng+tur" başarısızsa "eng";
+    tek başına İngilizce dışı dil (ör. "tur") başarısızsa geçiş atlanır (metin None).
+    Dönüş: (metin, kullanılan dil).
+    """
+    try:
+        with stage("tesseract"):
+            return engine.image_to_string(img, lang, psm), lang
+    except Exception:
+        # Türkçe dil paketi yoksa İngilizce OCR ile devam
+        if lang == "eng":
+            raise
+        if "+" not in lang:
+            return None, lang
+    with stage("tesseract"):
+        return engine.image_to_string(img, "eng", psm), "eng"
+
+def ocr_image(
+    img: Image.Image,
+    with_mrz: bool = False,
+    cache: Optional[PreprocessCache] = None,
+    page_key: Any = 1,
+    mrz_band: Optional[Callable[[], Image.Image]] = None,
+) -> Dict[str, Any]:
+    """
+    Tek görüntüyü OCR_STRATEGY'ye göre OCR'lar.
+    - full: tüm geçişler (eng + tur, PSM 6/11/3, MRZ bandı)
+    - adaptive: her geçişten sonra ocr_text_sufficient; yeterliyse dur
+    OCR_LANG_MODE=combined ise eng+tur tek geçişte, çıktı satır bazında tekilleştirilir.
+    Çalışan geçişler "ocr_passes" içinde raporlanır.
+    Ön işleme `cache` üzerinden (page_key, bölge) başına bir kez yapılır.
+    mrz_band verilirse MRZ geçişi sayfa kırpması yerine onun döndürdüğü
+    (ayrı render edilmiş) bandı kullanır; yalnızca gerekirse çağrılır.
+    OCR_MRZ_FIRST: MRZ geçişi ilk sırada çalışır; TD3 check digit'leri
+    tutarsa diğer geçişler atlanır ve özet "mrz" içinde döner.
+    """
+    if cache is None:
+        with PreprocessCache() as local_cache:
+            return ocr_image(img, with_mrz, local_cache, page_key, mrz_band)
+
+    engine = get_ocr_engine()
+    join = dedupe_lines if OCR_LANG_MODE == "combined" else "\n".join
+    texts: List[str] = []
+    passes: List[str] = []
+    mrz = None
+
+    plan = ocr_pass_plan()
+    if with_mrz and OCR_MRZ_FIRST:
+        # MRZ bandı önce: check digit'ler tutarsa tam sayfa geçişlerine gerek yok
+        plan = [p for p in plan if p[0] == "mrz"] + [p for p in plan if p[0] != "mrz"]
+
+    for region, lang, psm in plan:
+        if region == "mrz" and not with_mrz:
+            continue
+        if region == "mrz" and mrz_band is not None:
+            source = img if cache.has(page_key, "mrz_clip") else mrz_band()
+            prepared = cache.get(page_key, "mrz_clip", source)
+        else:
+            prepared = cache.get(page_key, region, img)
+        text, lang = ocr_pass_text(engine, prepared, lang, psm)
+        if text is None:
+            continue
+        texts.append(text)
+        passes.append(f"{region}:{lang}:psm{psm}")
+
+        if region == "mrz" and OCR_MRZ_FIRST:
+            mrz = find_td3_mrz(texts[-1])
+            if mrz is not None and mrz["valid"]:
+                break
+
+        if OCR_STRATEGY == "adaptive" and ocr_text_sufficient(join(texts)):
+            break
+
+    out: Dict[str, Any] = {"text": join(texts), "ocr_passes": passes}
+    if mrz is not None:
+        out["mrz"] = mrz_summary(mrz)
+    return out
+
+def ocr_image_bytes(img_bytes: bytes, cache: Optional[PreprocessCache] = None) -> Dict[str, Any]:
+    # Image.open yalnızca başlığı okur: bellek, çözülmüş boyuttan önce ayrılır
+    src = Image.open(io.BytesIO(img_bytes))
+    with PIXEL_BUDGET.reserve(page_work_bytes(src.width * src.height)) as lease:
+        with stage("decode"):
+            img = src.convert("RGB")
+        src.close()
+        try:
+            # Pasaport fotoğrafları genellikle görüntü olarak gelir: MRZ bandı da denenir
+            out = ocr_image(img, with_mrz=OCR_MRZ_FIRST, cache=cache)
+            lease["rss_mb"] = rss_mb()
+        finally:
+            img.close()
+            if cache is not None:
+                cache.drop(1)
+    out["memory"] = lease
+    return out
+
+def pixmap_to_image(pix) -> Image.Image:
+    """
+    Pixmap örneklerini kopyasız PIL görüntüsüne sarar (PNG encode/decode yok).
+    Dönen görüntü pix'in belleğini paylaşır; pix kullanım bitene kadar yaşamalı.
+    """
+    mode = {1: "L", 2: "LA", 3: "RGB", 4: "RGBA"}[pix.n]
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    return img.convert("RGB") if pix.alpha else img
+
+def probe_gray(page):
+    # OCR_PROBE_DPI gri render (yerleşim / metin yüksekliği ölçümleri için, numpy kopyası)
+    pix = page.get_pixmap(dpi=OCR_PROBE_DPI, colorspace=fitz.csGRAY)
+    a = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width].copy()
+    del pix
+    return a
+
+def _probe_text_height_pt(gray) -> Optional[float]:
+    """
+    Düşük DPI probe (probe_gray): satır profilinden medyan metin (mürekkep)
+    yüksekliği (pt). Güvenilir ölçüm yoksa None.
+    """
+    dark = (gray < 128).mean(axis=1)
+    # Metin satırı: karanlık oranı makul (boş değil, dolu blok/fotoğraf değil)
+    rows = (dark > 0.002) & (dark < 0.5)
+
+    runs: List[int] = []
+    run = 0
+    for r in rows.tolist() + [False]:
+        if r:
+            run += 1
+        elif run:
+            runs.append(run)
+            run = 0
+
+    max_run = len(dark) * 0.05
+    runs = [r for r in runs if 2 <= r <= max_run]
+    if len(runs) < 3:
+        return None
+    return float(np.median(runs)) * 72.0 / OCR_PROBE_DPI
+
+def _embedded_scan_dpi(page) -> Optional[float]:
+    # Sayfanın yarısından fazlasını kaplayan gömülü görüntünün gerçek çözünürlüğü
+    page_area = page.rect.width * page.rect.height
+    best = None
+    for info in page.get_images(full=True):
+        xref, width = info[0], info[2]
+        for rect in page.get_image_rects(xref):
+            if rect.width <= 0 or rect.width * rect.height < page_area * 0.5:
+                continue
+            dpi = width / (rect.width / 72.0)
+            best = dpi if best is None else max(best, dpi)
+    return best
+
+def plan_page_render(page, probe=None) -> Dict[str, Any]:
+    """
+    probe: çağıranın render ettiği probe_gray görüntüsü (yerleşim analiziyle
+    paylaşılır); verilmezse burada render edilir.
+    Sayfa başına render DPI'ı:
+    - fiziksel boyut: piksel sayısı OCR_MAX_PAGE_PIXELS'i aşmaz
+    - gömülü tarama: tarama çözünürlüğünün üstüne çıkılmaz
+    - metin yüksekliği (probe): satırlar ~OCR_TARGET_TEXT_PX piksel olacak kadar
+    Her zaman [OCR_MIN_DPI, OCR_DPI] aralığında. MRZ bandı gerekirse ayrıca OCR_DPI'da render edilir.
+    """
+    if OCR_RENDER_MODE != "adaptive":
+        return {"dpi": OCR_DPI, "reasons": ["fixed"]}
+
+    dpi = float(OCR_DPI)
+    reasons: List[str] = []
+
+    area_in2 = (page.rect.width / 72.0) * (page.rect.height / 72.0)
+    size_dpi = (OCR_MAX_PAGE_PIXELS / area_in2) ** 0.5 if area_in2 > 0 else dpi
+    if size_dpi < dpi:
+        dpi = size_dpi
+        reasons.append("page_size")
+
+    if probe is None and np is not None:
+        probe = probe_gray(page)
+    line_pt = _probe_text_height_pt(probe) if probe is not None else None
+    if line_pt:
+        text_dpi = OCR_TARGET_TEXT_PX / (line_pt / 72.0)
+        if text_dpi < dpi:
+            dpi = text_dpi
+            reasons.append("text_height")
+
+    scan_dpi = _embedded_scan_dpi(page)
+    if scan_dpi and scan_dpi < dpi:
+        dpi = scan_dpi
+        reasons.append("embedded_scan")
+
+    dpi = int(round(max(OCR_MIN_DPI, min(OCR_DPI, dpi))))
+    plan: Dict[str, Any] = {"dpi": dpi, "reasons": reasons or ["default"]}
+    if line_pt:
+        plan["text_height_pt"] = round(line_pt, 2)
+    return plan
+
+def render_mrz_band(page, dpi: int = OCR_DPI) -> Image.Image:
+    # MRZ bandını tam çözünürlükte, yalnızca o bölge için render et
+    r = page.rect
+    clip = fitz.Rect(r.x0, r.y0 + r.height * MRZ_BAND_TOP, r.x1, r.y1)
+    with stage("render"):
+        pix = page.get_pixmap(dpi=dpi, clip=clip)
+        img = pixmap_to_image(pix).copy()
+    del pix
+    return img
+
+def _runs(flags) -> List[Tuple[int, int]]:
+    # True dizilerinin [başlangıç, bitiş) aralıkları
+    d = np.diff(np.concatenate(([0], flags.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(d == 1).tolist(), np.flatnonzero(d == -1).tolist()))
+
+def _box_any(mask, k: int):
+    # Satır boyunca ~k genişliğinde (2 * (k // 2) + 1) merkezli pencerede en az bir True var mı
+    r = k // 2
+    w = 2 * r + 1
+    c = np.cumsum(np.pad(mask, ((0, 0), (r + 1, r))), axis=1, dtype=np.int32)
+    return (c[:, w:] - c[:, :-w]) > 0
+
+def _close(mask, k: int, axis: int):
+    # 1D morfolojik kapama: k pikselden kısa boşlukları doldur
+    if axis == 0:
+        return _close(mask.T, k, 1).T
+    return ~_box_any(~_box_any(mask, k), k)
+
+def _xy_cut(mask) -> List[Tuple[int, int, int, int]]:
+    """
+    Recursive XY-cut: boş satır/sütun bantlarından bölerek sıkı kutular
+    (y0, x0, y1, x1) üretir; hiçbir eksende bölünemeyen bölge bir bloktur.
+    """
+    out: List[Tuple[int, int, int, int]] = []
+    stack = [(0, 0, mask.shape[0], mask.shape[1])]
+    while stack:
+        y0, x0, y1, x1 = stack.pop()
+        sub = mask[y0:y1, x0:x1]
+        rows = _runs(sub.any(axis=1))
+        if len(rows) > 1:
+            stack.extend((y0 + a, x0, y0 + b, x1) for a, b in rows)
+            continue
+        cols = _runs(sub.any(axis=0))
+        if len(cols) > 1:
+            stack.extend((y0, x0 + a, y1, x0 + b) for a, b in cols)
+            continue
+        if rows and cols:
+            out.append((y0 + rows[0][0], x0 + cols[0][0], y0 + rows[0][1], x0 + cols[0][1]))
+    return out
+
+def _merge_table_rows(boxes: List[Tuple[int, int, int, int]]) -> List[Tuple[Tuple[int, int, int, int], bool]]:
+    """
+    Aynı yatay bantta yan yana >= 3 blok: tablo; tek bölge olarak birleştirilir
+    (satır sırası OCR'da korunur). Dönüş: (kutu, tablo mu).
+    """
+    groups: List[List[Any]] = []
+    for b in sorted(boxes):
+        for g in groups:
+            overlap = min(b[2], g[1]) - max(b[0], g[0])
+            if overlap >= 0.5 * min(b[2] - b[0], g[1] - g[0]):
+                g[0], g[1] = min(g[0], b[0]), max(g[1], b[2])
+                g[2].append(b)
+                break
+        else:
+            groups.append([b[0], b[2], [b]])
+    out: List[Tuple[Tuple[int, int, int, int], bool]] = []
+    for _, _, members in groups:
+        if len(members) >= 3:
+            out.append(((
+                min(m[0] for m in members), min(m[1] for m in members),
+                max(m[2] for m in members), max(m[3] for m in members),
+            ), True))
+        else:
+            out.extend((m, False) for m in members)
+    return out
+
+MRZ_CHARSET = set("ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789<")
+
+def looks_like_mrz(text: str) -> bool:
+    """
+    OCR/metin katmanı metni MRZ mi: 2-3 satır, satır başına ~30-44 karakter
+    (TD1/TD2/TD3), neredeyse tamamı [A-Z0-9<] ve dolgu karakteri içerir.
+    OCR iki satırı birleştirdiyse tek ~88 karakterlik satır da kabul edilir.
+    """
+    lines = [_mrz_clean(ln) for ln in text.splitlines() if ln.strip()]
+    if len(lines) == 1 and 2 * MRZ_LINE_LEN - 4 <= len(lines[0]) <= 2 * MRZ_LINE_LEN + 4:
+        lines = [lines[0][:len(lines[0]) // 2], lines[0][len(lines[0]) // 2:]]
+    if not 2 <= len(lines) <= 3 or not all(28 <= len(ln) <= MRZ_LINE_LEN + 4 for ln in lines):
+        return False
+    chars = "".join(lines)
+    return "<" in chars and sum(c in MRZ_CHARSET for c in chars) >= 0.9 * len(chars)
+
+def _mrz_geometry(cell, page_w_px: int) -> bool:
+    """
+    Probe üzerinde MRZ adayı: 2-3 satır, satırlar eşit genişlikte (sabit
+    uzunluklu, eş aralıklı satırlar), sayfanın en az %45'i kadar geniş ve
+    satır yüksekliğinin >= 20 katı uzun. Kesin etiket OCR metniyle
+    (looks_like_mrz) verilir.
+    """
+    rows = _runs(cell.any(axis=1))
+    if not 2 <= len(rows) <= 3:
+        return False
+    widths = []
+    for a, b in rows:
+        cols = np.flatnonzero(cell[a:b].any(axis=0))
+        widths.append(int(cols[-1] - cols[0] + 1))
+        if widths[-1] < 20 * (b - a):
+            return False
+    return min(widths) >= 0.9 * max(widths) and max(widths) >= 0.45 * page_w_px
+
+def classify_region(bbox: Tuple[float, float, float, float], page_h: float, mrz_like: bool) -> str:
+    # Bölge türü: mrz (çağıran karar verir), header (üst %15) veya text
+    if mrz_like:
+        return "mrz"
+    if bbox[3] <= 0.15 * page_h:
+        return "header"
+    return "text"
+
+def detect_text_regions(page, probe=None, text_height_pt: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Ucuz yerleşim analizi (OCR_PROBE_DPI gri probe, numpy): kelime ve satır
+    boşlukları ölçülen metin yüksekliğiyle orantılı kapatılır, XY-cut ile
+    bloklar bulunur; fotoğraf/logo blokları atılır, yan yana bloklar tablo
+    olarak birleştirilir, kalanlar sınıflanır ("mrz" burada yalnızca aday).
+    probe / text_height_pt render planından gelir (ikinci render yok).
+    Dönüş: okuma sırasında bölgeler (bbox: PDF noktası) + kaplama oranı.
+    numpy yoksa veya sayfada blok yoksa None.
+    """
+    if np is None:
+        return None
+    if probe is None:
+        probe = probe_gray(page)
+    if text_height_pt is None:
+        text_height_pt = _probe_text_height_pt(probe) or ROI_DEFAULT_TEXT_PT
+    ink = probe < 160
+    scale = 72.0 / OCR_PROBE_DPI
+    px = lambda pt: max(1, int(round(pt / scale)))
+    closed = _close(_close(ink, px(ROI_WORD_GAP * text_height_pt), 1), px(ROI_LINE_GAP * text_height_pt), 0)
+
+    blocks: List[Tuple[int, int, int, int]] = []
+    for y0, x0, y1, x1 in _xy_cut(closed):
+        cell = ink[y0:y1, x0:x1]
+        if y1 - y0 < 3 or x1 - x0 < 3 or cell.sum() < 8:
+            continue
+        if cell.mean() > ROI_IMAGE_DENSITY and (y1 - y0) > px(4 * text_height_pt):
+            continue
+        blocks.append((y0, x0, y1, x1))
+    if not blocks:
+        return None
+
+    r = page.rect
+    pad = ROI_PAD_PT
+    regions: List[Dict[str, Any]] = []
+    covered = 0.0
+    for (y0, x0, y1, x1), table in _merge_table_rows(blocks):
+        bbox = (
+            max(0.0, x0 * scale - pad), max(0.0, y0 * scale - pad),
+            min(r.width, x1 * scale + pad), min(r.height, y1 * scale + pad),
+        )
+        if table:
+            kind = "table"
+        else:
+            kind = classify_region(bbox, r.height, _mrz_geometry(ink[y0:y1, x0:x1], ink.shape[1]))
+        covered += (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
+        regions.append({"kind": kind, "bbox": [round(v + o, 1) for v, o in zip(bbox, (r.x0, r.y0, r.x0, r.y0))]})
+    regions.sort(key=lambda g: (g["bbox"][1], g["bbox"][0]))
+    return {"regions": regions, "coverage": round(covered / (r.width * r.height), 3)}
 
-        page_texts.append({
-            "page": i + 1,
-            "text": text
+def roi_cost(page, plan: Dict[str, Any], layout: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Motor maliyeti tahmini (piksel eşdeğeri): bölgeler (çağrı başına sabit
+    maliyet + bölge pikselleri) vs tek tam sayfa geçişi. "cheaper" False ise
+    bölge OCR'ı yapılmaz.
+    """
+    call = OCR_CALL_COST_PX.get(get_ocr_engine().name, OCR_CALL_COST_PX["pytesseract"])
+    regions = sum(
+        call + render_pixels(fitz.Rect(g["bbox"]), OCR_DPI if g["kind"] == "mrz" else plan["dpi"])
+        for g in layout["regions"]
+    )
+    full = call + render_pixels(page.rect, plan["dpi"])
+    return {"regions_px": int(regions), "page_px": int(full), "cheaper": regions < full}
+
+def roi_pass(kind: str) -> Tuple[str, str, int]:
+    """
+    Bölge türü -> (ön işleme profili, dil, psm). Metin blokları planın ilk sayfa
+    geçişinin diliyle PSM 6 (tek blok); MRZ bandı OCR-B için eng, PSM 11.
+    """
+    if kind == "mrz":
+        return "mrz_clip", "eng", 11
+    lang = next((lang for region, lang, _ in ocr_pass_plan() if region == "page"), "eng")
+    return "page", lang, 6
+
+def ocr_pdf_regions(page, plan: Dict[str, Any], layout: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Yalnızca bölgeleri tam çözünürlükte (MRZ: OCR_DPI, diğerleri plan DPI'ı)
+    render edip tek geçişte OCR'lar. Geçerli MRZ bulunamaz ve metin
+    ocr_text_sufficient değilse None (çağıran tam sayfa geçişlerine döner).
+    """
+    engine = get_ocr_engine()
+    regions = layout["regions"]
+    dpi_of = lambda g: OCR_DPI if g["kind"] == "mrz" else plan["dpi"]
+    pixels = sum(render_pixels(fitz.Rect(g["bbox"]), dpi_of(g)) for g in regions)
+
+    passes: List[str] = []
+
+    def ocr_region(g: Dict[str, Any]) -> None:
+        profile, lang, psm = roi_pass(g["kind"])
+        with stage("render"):
+            pix = page.get_pixmap(dpi=dpi_of(g), clip=fitz.Rect(g["bbox"]))
+            img = pixmap_to_image(pix)
+        try:
+            with stage("preprocess"):
+                prepared = PREPROCESS_PROFILES[profile](img)
+            try:
+                # Tam sayfa geçişleriyle aynı dil düşüşü (tur paketi yoksa eng)
+                text, lang = ocr_pass_text(engine, prepared, lang, psm)
+            finally:
+                prepared.close()
+        finally:
+            img.close()
+            del img, pix
+        g["text"] = text or ""
+        if text is not None and f"roi:{g['kind']}:{lang}:psm{psm}" not in passes:
+            passes.append(f"roi:{g['kind']}:{lang}:psm{psm}")
+
+    mrz = None
+    with PIXEL_BUDGET.reserve(page_work_bytes(pixels)) as lease:
+        for g in regions:
+            ocr_region(g)
+            # "mrz" yerleşimde yalnızca geometrik aday: etiketi OCR metni belirler
+            if g["kind"] == "mrz" and not looks_like_mrz(g["text"]):
+                g["kind"] = "text"
+                ocr_region(g)
+            elif g["kind"] != "mrz" and looks_like_mrz(g["text"]):
+                g["kind"] = "mrz"
+            if g["kind"] == "mrz" and mrz is None:
+                mrz = find_td3_mrz(g["text"])
+        lease["rss_mb"] = rss_mb()
+
+    text = "\n".join(g["text"] for g in regions)
+    if not ((mrz is not None and mrz["valid"]) or ocr_text_sufficient(text)):
+        return None
+    out: Dict[str, Any] = {
+        "text": text,
+        "method": "ocr_roi",
+        "ocr_passes": passes,
+        "regions": regions,
+        "roi": {"used": True, "regions": len(regions), "coverage": layout["coverage"]},
+        "memory": lease,
+    }
+    if mrz is not None:
+        out["mrz"] = mrz_summary(mrz)
+    return out
+
+def text_layer_regions(page) -> List[Dict[str, Any]]:
+    # Gömülü metin katmanının blokları: OCR'sız bölge koordinatları
+    r = page.rect
+    regions = []
+    for x0, y0, x1, y1, text, _, kind in page.get_text("blocks"):
+        if kind != 0 or not text.strip():
+            continue
+        bbox = (x0 - r.x0, y0 - r.y0, x1 - r.x0, y1 - r.y0)
+        regions.append({
+            "kind": classify_region(bbox, r.height, looks_like_mrz(text)),
+            "bbox": [round(v, 1) for v in (x0, y0, x1, y1)],
+            "text": text,
         })
+    return regions
 
-        del img_bytes
+_TEXT_LAYER_PUNCT = set(".,:;-_/\\()[]{}<>+*=%&@#'\"!?€$₺|")
 
-    doc.close()
+def text_layer_quality(text: str) -> Dict[str, Any]:
+    """
+    Gömülü metin katmanı yeterli mi? (karakter sayısı + bozuk karakter oranı)
+    """
+    chars = [c for c in text if not c.isspace()]
+    garbage = sum(
+        1 for c in chars
+        if c == "\ufffd" or not (c.isalnum() or c in _TEXT_LAYER_PUNCT)
+    )
+    ratio = garbage / len(chars) if chars else 1.0
+    return {
+        "chars": len(chars),
+        "garbage_ratio": round(ratio, 3),
+        "usable": len(chars) >= TEXT_LAYER_MIN_CHARS and ratio <= TEXT_LAYER_MAX_GARBAGE,
+    }
+
+def extract_pdf_page(page, cache: Optional[PreprocessCache] = None) -> Dict[str, Any]:
+    """
+    Tek PDF sayfası: önce gömülü metin katmanı (milisaniyeler), kalite
+    kontrolünden geçemezse OCR. Kullanılan yöntem "method", aşama
+    süreleri "timings" ile raporlanır.
+    """
+    with collect_timings() as timings:
+        out = _extract_pdf_page(page, cache)
+    out["timings"] = timings.as_dict()
+    return out
+
+def _extract_pdf_page(page, cache: Optional[PreprocessCache] = None) -> Dict[str, Any]:
+    if OCR_TEXT_LAYER:
+        with stage("text_layer"):
+            text = page.get_text()
+        quality = text_layer_quality(text)
+        if quality["usable"]:
+            return {
+                "text": text, "method": "text_layer", "ocr_passes": [], "text_layer": quality,
+                "regions": text_layer_regions(page),
+            }
+        # Metin, görüntü ve çizim yok: boş sayfa, OCR gereksiz
+        if not text.strip() and not page.get_images() and not page.get_drawings():
+            return {"text": "", "method": "empty", "ocr_passes": []}
+    return {"method": "ocr", **ocr_pdf_page(page, cache)}
+
+def ocr_pdf_page(page, cache: Optional[PreprocessCache] = None) -> Dict[str, Any]:
+    """
+    Tek PDF sayfası: tam sayfa OCR (eng + tur) + MRZ alt bant OCR.
+    Ham piksel tamponu doğrudan kullanılır; ön işleme sayfa başına bir kez yapılır.
+    Sayfa plan_page_render DPI'ında render edilir; daha düşükse MRZ bandı OCR_DPI'da ayrıca.
+    """
+    use_roi = OCR_ROI and OCR_STRATEGY == "adaptive" and np is not None
+    with stage("render_plan"):
+        # Tek probe render'ı: DPI planı ve yerleşim analizi paylaşır
+        probe = probe_gray(page) if np is not None and (use_roi or OCR_RENDER_MODE == "adaptive") else None
+        plan = plan_page_render(page, probe)
+
+    roi = None
+    if use_roi:
+        with stage("layout"):
+            layout = detect_text_regions(page, probe, plan.get("text_height_pt"))
+        del probe
+        cost = roi_cost(page, plan, layout) if layout is not None else None
+        if layout is None:
+            roi = {"used": False, "reason": "no_regions"}
+        elif layout["coverage"] > OCR_ROI_MAX_COVERAGE:
+            roi = {"used": False, "reason": "coverage", "coverage": layout["coverage"]}
+        elif len(layout["regions"]) > OCR_ROI_MAX_REGIONS:
+            roi = {"used": False, "reason": "regions", "regions": len(layout["regions"])}
+        elif not cost["cheaper"]:
+            roi = {"used": False, "reason": "cost", "regions": len(layout["regions"]), **cost}
+        else:
+            out = ocr_pdf_regions(page, plan, layout)
+            if out is not None:
+                out["render"] = plan
+                return out
+            roi = {"used": False, "reason": "insufficient", "regions": len(layout["regions"])}
+
+    pixels = render_pixels(page.rect, plan["dpi"])
+    mrz_band = None
+    if plan["dpi"] < OCR_DPI:
+        mrz_band = lambda: render_mrz_band(page)
+        pixels += render_pixels(page.rect, OCR_DPI, 1 - MRZ_BAND_TOP)
+
+    page_key = page.number + 1
+    with PIXEL_BUDGET.reserve(page_work_bytes(pixels)) as lease:
+        with stage("render"):
+            pix = page.get_pixmap(dpi=plan["dpi"])
+        img = pixmap_to_image(pix)
+        try:
+            out = ocr_image(img, with_mrz=True, cache=cache, page_key=page_key, mrz_band=mrz_band)
+            # Sayfanın görüntüleri hâlâ bellekteyken: sayfa başına tepeye yakın RSS
+            lease["rss_mb"] = rss_mb()
+        finally:
+            img.close()
+            del img, pix
+            if cache is not None:
+                cache.drop(page_key)
+    out["render"] = plan
+    out["memory"] = lease
+    if roi is not None:
+        out["roi"] = roi
+    return out
+
+def iter_pdf_pages(doc, pages: int) -> Iterator[Dict[str, Any]]:
+    """
+    İlk `pages` sayfayı sırayla çıkarır ve her sayfayı biter bitmez verir.
+    Generator kapatılınca (erken durdurma) ön işleme önbelleği temizlenir.
+    """
+    with PreprocessCache() as cache:
+        for i in range(pages):
+            yield {"page": i + 1, **extract_pdf_page(doc[i], cache)}
+
+def ocr_pdf_bytes(
+    pdf_bytes: bytes,
+    max_pages: int = MAX_PDF_PAGES,
+    early_stop: bool = OCR_EARLY_STOP,
+):
+    """
+    Sayfa sayfa çıkarım; early_stop ise document_complete olunca kalan sayfalar atlanır.
+    Dönüş: (işlenen sayfalar, belgedeki sayfa sayısı (max_pages ile sınırlı)).
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    pages = min(len(doc), max_pages)
+
+    page_texts = []
+    page_iter = iter_pdf_pages(doc, pages)
+    try:
+        for page in page_iter:
+            page_texts.append(page)
+            if early_stop and len(page_texts) < pages and document_complete(page_texts):
+                break
+    finally:
+        page_iter.close()
+        doc.close()
     return page_texts, pages
 
+def pdf_page_count(pdf_bytes: bytes, max_pages: int = MAX_PDF_PAGES) -> int:
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        return min(len(doc), max_pages)
+    finally:
+        doc.close()
+
+def ocr_pdf_page_bytes(pdf_bytes: bytes, index: int) -> Dict[str, Any]:
+    """
+    Fan-out birimi: PDF'in tek sayfasını kendi fitz handle'ı ile OCR'lar
+    (fitz.Document thread'ler arasında paylaşılamaz).
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    try:
+        with PreprocessCache() as cache:
+            return {"page": index + 1, **extract_pdf_page(doc[index], cache)}
+    finally:
+        doc.close()
+
+def ocr_image_file(file_bytes: bytes) -> Dict[str, Any]:
+    # Görüntü için de multi-language OCR
+    with PreprocessCache() as cache, collect_timings() as timings:
+        page = {"page": 1, "method": "ocr", **ocr_image_bytes(file_bytes, cache)}
+    page["timings"] = timings.as_dict()
+
+    return {
+        "text": page["text"],             # GERİYE UYUMLULUK için
+        "pages_processed": 1,
+        "pages": [page]
+    }
+
+def pdf_ocr_result(page_list: List[Dict[str, Any]], pages_total: Optional[int] = None) -> Dict[str, Any]:
+    joined_text = "\n".join([p["text"] for p in page_list])
+    if pages_total is None:
+        pages_total = len(page_list)
+    return {
+        "text": joined_text,              # GERİYE UYUMLULUK için
+        "pages_processed": len(page_list),
+        "pages_total": pages_total,
+        "early_stop": len(page_list) < pages_total,
+        "pages": page_list                # ✅ page-level
+    }
+
 def extract_text_kvkk_safe(file_bytes: bytes, content_type: str) -> Dict[str, Any]:
     """
     KVKK-safe: bytes ve ham OCR text sadece RAM içinde.
     Disk'e yazma yok.
     """
     if content_type == "application/pdf":
-        page_list, pages = ocr_pdf_bytes(file_bytes)
-        joined_text = "\n".join([p["text"] for p in page_list])
-        return {
-            "text": joined_text,              # GERİYE UYUMLULUK için
-            "pages_processed": pages,
-            "pages": page_list                # ✅ page-level
-        }
+        page_list, pages_total = ocr_pdf_bytes(file_bytes)
+        return pdf_ocr_result(page_list, pages_total)
     else:
-        # Görüntü için de multi-language OCR
-        text_eng = ocr_image_bytes(file_bytes, lang="eng")
-        try:
-            text_tur = ocr_image_bytes(file_bytes, lang="tur")
-        except:
-            text_tur = ""
-        
-        text = text_eng + "\n" + text_tur
-        
-        return {
-            "text": text,                     # GERİYE UYUMLULUK için
-            "pages_processed": 1,
-            "pages": [{"page": 1, "text": text}]
-        }
+        return ocr_image_file(file_bytes)
+
+
+# ----------------------------
+# OCR worker havuzu (RAM only, event loop dışı)
+# ----------------------------
+class OcrQueueFull(Exception):
+    """Havuz kapasitesi dolu; istemci Retry-After sonrası tekrar denemeli."""
+
+
+class OcrTicket:
+    """
+    Tek bir /analyze isteğinin havuzdaki kabul kaydı.
+    Slot, isteğin gönderdiği tüm işler bitene kadar (timeout olsa bile) tutulur;
+    böylece arka planda hâlâ çalışan OCR işleri kapasiteden düşülmez.
+    """
+
+    def __init__(self, pool: "OcrWorkerPool", timeout_s: float):
+        self._pool = pool
+        self._deadline = time.monotonic() + timeout_s
+        self._outstanding = 0
+        self._closed = False
+        self._released = False
+        self._parallel = asyncio.Semaphore(max(1, OCR_REQUEST_PARALLELISM))
+
+    def remaining(self) -> float:
+        return max(0.0, self._deadline - time.monotonic())
+
+    def _on_done(self, _fut) -> None:
+        with self._pool._lock:
+            self._outstanding -= 1
+            release = self._closed and self._outstanding == 0
+        if release:
+            self._release()
+
+    def _release(self) -> None:
+        with self._pool._lock:
+            if self._released:
+                return
+            self._released = True
+            self._pool._pending -= 1
+
+    async def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        async with self._parallel:
+            # İş bellek bütçesinde isteğin kalan süresinden fazla beklemez; iptal
+            # bayrağı (thread havuzu) beklemeyi hemen bitirir
+            cancelled = threading.Event() if self._pool.kind != "process" else None
+            deadline = time.time() + self.remaining()
+            job: Tuple[Any, ...] = (fn, *args)
+            if self._pool.kind != "process" and PROFILER.profiling():
+                # Yalnızca örneklenen isteğin işlerini çalıştıran thread'ler örneklenir
+                job = (PROFILER.run_worker, fn, *args)
+            cf = self._pool._get_executor().submit(run_pool_job, deadline, cancelled, *job)
+            with self._pool._lock:
+                self._outstanding += 1
+            cf.add_done_callback(self._on_done)
+            try:
+                # wrap_future iptali, henüz başlamamış executor işini de iptal eder
+                return await asyncio.wrap_future(cf)
+            except asyncio.CancelledError:
+                if cancelled is not None:
+                    cancelled.set()
+                    PIXEL_BUDGET.wake()
+                raise
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        fn(*args) işini havuzda çalıştırır. İsteğin kalan süresi dolarsa
+        asyncio.TimeoutError fırlatır; henüz başlamamış iş iptal edilir.
+        """
+        return await asyncio.wait_for(self._run(fn, *args), timeout=self.remaining())
+
+    def close(self) -> None:
+        with self._pool._lock:
+            self._closed = True
+            release = self._outstanding == 0
+        if release:
+            self._release()
+
+
+class OcrWorkerPool:
+    """
+    OCR (OCR motoru + PyMuPDF) işlerini thread/process havuzunda çalıştırır.
+    - Executor boyutu (OCR_WORKERS) global CPU bütçesidir
+    - Aynı anda en fazla OCR_MAX_PENDING istek kabul edilir, fazlası OcrQueueFull
+    """
+
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                # initializer: OCR motoru worker başına bir kez hazırlanır
+                if self.kind == "process":
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, initializer=get_ocr_engine
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="ocr",
+                        initializer=get_ocr_engine,
+                    )
+            return self._executor
+
+    def admit(self, timeout_s: float = OCR_TIMEOUT_S) -> OcrTicket:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise OcrQueueFull()
+            self._pending += 1
+        return OcrTicket(self, timeout_s)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+OCR_POOL = OcrWorkerPool(OCR_POOL_KIND, OCR_WORKERS, OCR_MAX_PENDING)
+
+
+async def _gather_ocr(jobs: List[Any]) -> List[Any]:
+    # Tüm işlerin bitmesini bekle; ilk hatayı (ör. TimeoutError) yeniden fırlat
+    results = await asyncio.gather(*jobs, return_exceptions=True)
+    for r in results:
+        if isinstance(r, BaseException):
+            raise r
+    return results
+
+
+async def ocr_file_fanout(ticket: OcrTicket, data: bytes, ctype: str) -> Dict[str, Any]:
+    """
+    Tek dosya: görüntü ise tek iş; PDF ise sayfalar havuza gönderilir.
+    - OCR_EARLY_STOP kapalı: tüm sayfalar aynı anda
+    - açık: önce ilk sayfa tek başına; belge document_complete değilse sonraki
+      sayfalar en fazla OCR_EARLY_STOP_WINDOW kadarı aynı anda çalışacak şekilde.
+      Belge tamamlanınca boşa giden iş en fazla pencere - 1 sayfadır.
+    Sonuçlar sayfa sırasıyla toplanır (deterministik çıktı).
+    """
+    if ctype != "application/pdf":
+        return await ticket.run(ocr_image_file, data)
+    count = await ticket.run(pdf_page_count, data)
+    if not OCR_EARLY_STOP:
+        jobs = [asyncio.ensure_future(ticket.run(ocr_pdf_page_bytes, data, p)) for p in range(count)]
+        return pdf_ocr_result(await _gather_ocr(jobs), count)
+
+    inflight: Dict[int, "asyncio.Future[Dict[str, Any]]"] = {}
+    pages: List[Dict[str, Any]] = []
+    window = 1
+    submitted = 0
+    try:
+        while len(pages) < count:
+            while submitted < count and len(inflight) < window:
+                inflight[submitted] = asyncio.ensure_future(ticket.run(ocr_pdf_page_bytes, data, submitted))
+                submitted += 1
+            pages.append(await inflight.pop(len(pages)))
+            window = OCR_EARLY_STOP_WINDOW
+            # Skorlama + alan çıkarımı tüm metin üzerinde: event loop dışında
+            # (pencere sayfaları bu sırada havuzda çalışmaya devam eder)
+            if len(pages) < count and await asyncio.to_thread(document_complete, list(pages)):
+                break
+    finally:
+        for job in inflight.values():
+            job.cancel()
+        await asyncio.gather(*inflight.values(), return_exceptions=True)
+    return pdf_ocr_result(pages, count)
+
+
+async def ocr_files_fanout(
+    ticket: OcrTicket,
+    items: List[Tuple[bytes, str]]
+) -> List[Dict[str, Any]]:
+    """
+    Tüm dosyaların tüm PDF sayfalarını aynı anda havuza gönderir.
+    Paralellik OCR_WORKERS (global) ve OCR_REQUEST_PARALLELISM (istek) ile sınırlı.
+    Sonuçlar dosya sırasına göre döner.
+    """
+    return await _gather_ocr([ocr_file_fanout(ticket, data, ctype) for data, ctype in items])
 
 
 # ----------------------------
@@ -234,25 +2024,13 @@ DOC_TYPES = [
     "unknown",
 ]
 
-def detect_doc_type(text: str) -> str:
-    """
-    Basit anahtar kelime skorlaması.
-
-    Kritik davranış:
-    - max_score == 0 => unknown
-    - max_score < CONFIDENCE_THRESHOLD => irrelevant_document
-    """
-    t = normalize_text(text).lower()
-
-    # unknown/irrelevant skorlanmaz
-    scores: Dict[str, int] = {k: 0 for k in DOC_TYPES if k not in ("unknown", "irrelevant_document")}
-
-    # ----------------------------
+# Belge türü skorlama spesifikasyonu (declarative)
+# (belge türü, anahtar kelime başına puan, anahtar kelimeler)
+# Her anahtar kelime metinde geçiyorsa (alt dizgi) bir kez puanlanır.
+DOC_TYPE_KEYWORDS: List[Tuple[str, int, List[str]]] = [
     # CORE
-    # ----------------------------
-
-    # Pasaport - İYİLEŞTİRİLMİŞ ALGILAMA
-    passport_keywords = [
+    # Pasaport
+    ("passport", 2, [
         # İngilizce
         "passport", "passport no", "passport number", "passport nr",
         "nationality", "nationality code",
@@ -278,170 +2056,170 @@ def detect_doc_type(text: str) -> str:
         "cinsiyet", "erkek", "kadın",
         "veren makam", "makam",
         "türkiye", "türk",
-    ]
-    
-    for kw in passport_keywords:
-        if kw in t:
-            scores["passport"] += 2
-    
-    # MRZ Pattern Detection - İYİLEŞTİRİLMİŞ
-    tu = t.upper()
-    
-    # MRZ pattern'leri (çok daha kapsamlı)
-    mrz_patterns = [
-        r"P<[A-Z<]{2,}",  # P<TUR, P<USA, etc.
-        r"P<[A-Z]{3}[A-Z0-9<]{20,}",  # Pasaport MRZ başlangıcı
-        r"[A-Z0-9<]{30,}",  # Uzun MRZ satırı
-        r"<{5,}",  # Çok sayıda < karakteri (MRZ'de yaygın)
-        r"[A-Z]{3}[0-9]{6}[0-9][A-Z0-9]{3}[0-9]{11}[0-9]",  # MRZ formatı
-    ]
-    
-    mrz_score = 0
-    for pattern in mrz_patterns:
-        if re.search(pattern, tu):
-            mrz_score += 5
-    
-    if mrz_score > 0:
-        scores["passport"] += mrz_score
-    
-    # Ek pattern'ler
-    if "MRZ" in tu:
-        scores["passport"] += 10
-    
-    # Türk pasaportu için özel pattern'ler
-    if re.search(r"TUR[0-9]{6}", tu) or re.search(r"TURKEY", tu) or re.search(r"TÜRKİYE", tu):
-        scores["passport"] += 5
-    
-    # Pasaport numarası pattern'i (genellikle 6-9 haneli)
-    if re.search(r"\b[0-9]{6,9}\b", t) and ("passport" in t or "pasaport" in t):
-        scores["passport"] += 3
-
-
+    ]),
     # Banka dökümü
-    for kw in [
+    ("bank_statement", 2, [
         "account statement", "statement", "ekstre", "banka",
         "iban", "swift", "hesap özeti", "balance", "bakiye",
         "available", "account", "transactions", "transaction",
         "debit", "credit", "opening balance", "closing balance"
-    ]:
-        if kw in t:
-            scores["bank_statement"] += 2
-    if re.search(r"\btr\d{2}\b", t):
-        scores["bank_statement"] += 2
-
+    ]),
     # Seyahat sigortası
-    for kw in [
+    ("travel_insurance", 2, [
         "insurance", "sigorta", "policy", "poliçe", "coverage", "kapsam",
         "medical expenses", "emergency", "schengen",
         "30,000", "30000", "30.000", "30 000", "eur", "euro"
-    ]:
-        if kw in t:
-            scores["travel_insurance"] += 2
-
+    ]),
     # Uçuş rezervasyonu
-    for kw in [
+    ("flight_reservation", 2, [
         "itinerary", "flight", "pnr", "e-ticket", "boarding",
         "departure", "arrival", "uçuş", "rezervasyon", "bilet",
         "thy", "pegasus", "lufthansa", "airlines", "ticket number"
-    ]:
-        if kw in t:
-            scores["flight_reservation"] += 2
-
+    ]),
     # Konaklama
-    for kw in [
+    ("accommodation", 2, [
         "hotel", "reservation", "booking", "check-in", "check out", "check-out",
         "guest", "accommodation", "konaklama", "oda", "gece",
         "airbnb", "host", "property", "nights"
-    ]:
-        if kw in t:
-            scores["accommodation"] += 2
-
+    ]),
     # Başvuru formu
-    for kw in [
+    ("application_form", 1, [
         "application form", "visa application", "schengen visa",
         "form", "başvuru formu", "intended date", "intended",
         "number of entries", "duration of stay"
-    ]:
-        if kw in t:
-            scores["application_form"] += 1
+    ]),
 
-    # ----------------------------
     # SUPPORTING
-    # ----------------------------
-
     # Davetiye / evde kalma
-    for kw in [
+    ("invitation_letter", 2, [
         "invitation", "invited", "davet", "davet mektubu", "invitation letter",
         "hosting", "host", "i will host", "will host",
         "evimde kal", "evimde konaklayacak", "konaklamasını sağlayacağım",
         "address", "adres", "signature", "imza"
-    ]:
-        if kw in t:
-            scores["invitation_letter"] += 2
-
+    ]),
     # Sponsor dilekçesi
-    for kw in [
+    ("sponsorship_letter", 2, [
         "sponsor", "sponsorship", "financial support",
         "will cover expenses", "cover the expenses", "all expenses",
         "masraflarını karşılayacağım", "tüm masraflarını", "finansal destek"
-    ]:
-        if kw in t:
-            scores["sponsorship_letter"] += 2
-
+    ]),
     # Sponsor banka dökümü
-    for kw in ["sponsor bank", "sponsor's bank", "sponsor banka", "guarantor", "guarantee"]:
-        if kw in t:
-            scores["sponsor_bank_statement"] += 2
-
+    ("sponsor_bank_statement", 2, ["sponsor bank", "sponsor's bank", "sponsor banka", "guarantor", "guarantee"]),
     # Sponsor kimlik/pasaport fotokopisi
-    for kw in ["copy of id", "id card", "identity card", "kimlik fotokopisi", "nüfus cüzdanı", "passport copy"]:
-        if kw in t:
-            scores["sponsor_id_document"] += 2
-
+    ("sponsor_id_document", 2, ["copy of id", "id card", "identity card", "kimlik fotokopisi", "nüfus cüzdanı", "passport copy"]),
     # İşveren yazısı / izin yazısı
-    for kw in [
+    ("employer_letter", 2, [
         "employer", "işveren", "company letter", "employment letter",
         "izin verilmiştir", "paid leave", "unpaid leave", "leave granted",
         "position", "department", "start date", "salary"
-    ]:
-        if kw in t:
-            scores["employer_letter"] += 2
-
+    ]),
     # Maaş bordrosu
-    for kw in ["pay slip", "payslip", "salary slip", "bordro", "maaş bordrosu", "net pay", "gross pay"]:
-        if kw in t:
-            scores["salary_slip"] += 2
-
+    ("salary_slip", 2, ["pay slip", "payslip", "salary slip", "bordro", "maaş bordrosu", "net pay", "gross pay"]),
     # SGK dökümü
-    for kw in ["sgk", "4a", "hizmet dökümü", "service breakdown", "sigortalılık", "prim"]:
-        if kw in t:
-            scores["sgk_statement"] += 2
-
+    ("sgk_statement", 2, ["sgk", "4a", "hizmet dökümü", "service breakdown", "sigortalılık", "prim"]),
     # Öğrenci belgesi
-    for kw in ["student certificate", "öğrenci belgesi", "enrolled", "enrollment", "öğrencidir", "faculty", "department"]:
-        if kw in t:
-            scores["student_certificate"] += 2
-
+    ("student_certificate", 2, ["student certificate", "öğrenci belgesi", "enrolled", "enrollment", "öğrencidir", "faculty", "department"]),
     # Transkript
-    for kw in ["transcript", "gpa", "grade point", "not ortalaması", "ders", "course", "credits", "ects"]:
-        if kw in t:
-            scores["transcript"] += 2
-
+    ("transcript", 2, ["transcript", "gpa", "grade point", "not ortalaması", "ders", "course", "credits", "ects"]),
     # Oturum izni
-    for kw in ["residence permit", "oturum izni", "ikamet izni", "residence card"]:
-        if kw in t:
-            scores["residence_permit"] += 2
-
+    ("residence_permit", 2, ["residence permit", "oturum izni", "ikamet izni", "residence card"]),
     # Evlilik belgesi
-    for kw in ["marriage certificate", "evlilik cüzdanı", "evlenme kayıt", "marriage registration"]:
-        if kw in t:
-            scores["marriage_certificate"] += 2
-
+    ("marriage_certificate", 2, ["marriage certificate", "evlilik cüzdanı", "evlenme kayıt", "marriage registration"]),
     # Nüfus kayıt örneği
-    for kw in ["family registry", "nüfus kayıt örneği", "vukuatlı", "population registry"]:
-        if kw in t:
-            scores["family_registry"] += 2
+    ("family_registry", 2, ["family registry", "nüfus kayıt örneği", "vukuatlı", "population registry"]),
+]
+
+# Regex sinyalleri: (belge türü, puan, pattern, "lower" | "upper" metin, ön koşul kelimeleri)
+# Ön koşul verilirse kelimelerden en az biri metinde geçmelidir.
+DOC_TYPE_PATTERNS: List[Tuple[str, int, str, str, Tuple[str, ...]]] = [
+    # MRZ Pattern Detection - İYİLEŞTİRİLMİŞ
+    ("passport", 5, r"P<[A-Z<]{2,}", "upper", ()),  # P<TUR, P<USA, etc.
+    ("passport", 5, r"P<[A-Z]{3}[A-Z0-9<]{20,}", "upper", ()),  # Pasaport MRZ başlangıcı
+    ("passport", 5, r"[A-Z0-9<]{30,}", "upper", ()),  # Uzun MRZ satırı
+    ("passport", 5, r"<{5,}", "upper", ()),  # Çok sayıda < karakteri (MRZ'de yaygın)
+    ("passport", 5, r"[A-Z]{3}[0-9]{6}[0-9][A-Z0-9]{3}[0-9]{11}[0-9]", "upper", ()),  # MRZ formatı
+    # Ek pattern'ler
+    ("passport", 10, r"MRZ", "upper", ()),
+    # Türk pasaportu için özel pattern'ler
+    ("passport", 5, r"TUR[0-9]{6}|TURKEY|TÜRKİYE", "upper", ()),
+    # Pasaport numarası pattern'i (genellikle 6-9 haneli)
+    ("passport", 3, r"\b[0-9]{6,9}\b", "lower", ("passport", "pasaport")),
+    # TR IBAN başlangıcı
+    ("bank_statement", 2, r"\btr\d{2}\b", "lower", ()),
+]
+
+
+class KeywordMatcher:
+    """
+    Anahtar kelime kümesi için derlenmiş alt dizgi eşleyici: `{kw : kw in text}`.
+    - pyahocorasick varsa: import sırasında kurulan tek Aho–Corasick otomatı,
+      metin üzerinde tek doğrusal geçiş (örtüşen eşleşmeler dahil)
+    - yoksa: her benzersiz kelime için bir C düzeyinde `in` taraması
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = sorted(set(keywords))
+        self._automaton = None
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for kw in self.keywords:
+                automaton.add_word(kw, kw)
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def find(self, text: str) -> set:
+        if self._automaton is not None:
+            return {kw for _, kw in self._automaton.iter(text)}
+        return {kw for kw in self.keywords if kw in text}
+
+
+def _compile_doc_type_spec():
+    weights: Dict[str, List[Tuple[str, int]]] = {}
+    for doc_type, weight, keywords in DOC_TYPE_KEYWORDS:
+        for kw in keywords:
+            weights.setdefault(kw, []).append((doc_type, weight))
+    patterns = [
+        (doc_type, weight, re.compile(p), case, requires)
+        for doc_type, weight, p, case, requires in DOC_TYPE_PATTERNS
+    ]
+    return KeywordMatcher(list(weights)), weights, patterns
+
+_DOC_TYPE_MATCHER, _DOC_TYPE_WEIGHTS, _DOC_TYPE_PATTERNS = _compile_doc_type_spec()
+
+def score_doc_types(text: str) -> Dict[str, int]:
+    """
+    Basit anahtar kelime skorlaması (belge türü başına ham skor).
+    Anahtar kelimeler tek geçişte (KeywordMatcher), regex sinyalleri
+    DOC_TYPE_PATTERNS üzerinden puanlanır.
+    """
+    t = normalize_text(text).lower()
+    tu = t.upper()
+
+    # unknown/irrelevant skorlanmaz
+    scores: Dict[str, int] = {k: 0 for k in DOC_TYPES if k not in ("unknown", "irrelevant_document")}
+
+    found = _DOC_TYPE_MATCHER.find(t)
+    for kw in found:
+        for doc_type, weight in _DOC_TYPE_WEIGHTS[kw]:
+            scores[doc_type] += weight
+
+    for doc_type, weight, rx, case, requires in _DOC_TYPE_PATTERNS:
+        if requires and not any(r in found for r in requires):
+            continue
+        if rx.search(tu if case == "upper" else t):
+            scores[doc_type] += weight
+
+    return scores
+
+def detect_doc_type(text: str) -> str:
+    """
+    Basit anahtar kelime skorlaması.
 
+    Kritik davranış:
+    - max_score == 0 => unknown
+    - max_score < CONFIDENCE_THRESHOLD => irrelevant_document
+    """
+    scores = score_doc_types(text)
     best = max(scores, key=scores.get)
     max_score = scores[best]
 
@@ -456,119 +2234,216 @@ def detect_doc_type(text: str) -> str:
 # ----------------------------
 # 2) Belgeye özel alan çıkarımı (KVKK-safe)
 # ----------------------------
-DATE_PATTERNS = [
-    r"\b(\d{2}[./-]\d{2}[./-]\d{4})\b",
-    r"\b(\d{4}[./-]\d{2}[./-]\d{2})\b",
-    r"\b(\d{1,2}[./-]\d{1,2}[./-]\d{4})\b",  # Tek haneli gün/ay
-    r"\b(\d{2}[./-]\d{2}[./-]\d{2})\b",  # 2 haneli yıl
-    r"\b(\d{4}[./-]\d{1,2}[./-]\d{1,2})\b",  # YYYY-MM-DD tek haneli
-    r"(\d{2}\.\d{2}\.\d{4})",  # Nokta ile (boşluk olmadan)
-    r"(\d{2}/\d{2}/\d{4})",  # Slash ile (boşluk olmadan)
-    r"(\d{2}-\d{2}-\d{4})",  # Tire ile (boşluk olmadan)
-    r"(\d{4}\.\d{2}\.\d{2})",  # YYYY.MM.DD
-    r"(\d{4}/\d{2}/\d{2})",  # YYYY/MM/DD
-    r"(\d{4}-\d{2}-\d{2})",  # YYYY-MM-DD
-    r"(\d{1,2}\.\d{1,2}\.\d{4})",  # Tek haneli
-    r"(\d{1,2}/\d{1,2}/\d{4})",
-    r"(\d{1,2}-\d{1,2}-\d{4})",
-    r"(\d{8})",  # YYYYMMDD (boşluksuz, 8 haneli)
-    r"(\d{6})",  # YYMMDD (boşluksuz, 6 haneli)
-    # Ay isimli formatlar
-    r"(\d{1,2}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|january|february|march|april|june|july|august|september|october|november|december|ocak|şubat|mart|nisan|mayıs|haziran|temmuz|ağustos|eylül|ekim|kasım|aralık)\s+\d{4})",
-    r"(\d{4}\s+(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec|january|february|march|april|june|july|august|september|october|november|december|ocak|şubat|mart|nisan|mayıs|haziran|temmuz|ağustos|eylül|ekim|kasım|aralık)\s+\d{1,2})",
+# Ay isimleri (İngilizce + Türkçe) -> ay numarası
+DATE_MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+    "january": 1, "february": 2, "march": 3, "april": 4, "june": 6, "july": 7,
+    "august": 8, "september": 9, "october": 10, "november": 11, "december": 12,
+    "ocak": 1, "şubat": 2, "mart": 3, "nisan": 4, "mayıs": 5, "haziran": 6,
+    "temmuz": 7, "ağustos": 8, "eylül": 9, "ekim": 10, "kasım": 11, "aralık": 12,
+}
+_MONTH_ALT = "|".join(sorted(DATE_MONTHS, key=len, reverse=True))
+
+# Tarih format kayıt defteri: (tür, regex). Hepsi tek bir alternation'a derlenir;
+# metin bir kez taranır, her aday span bir kez bulunur ve lastgroup ile türüne
+# özel parser'a gönderilir. Ayraçlar (. / -) aynı tarih içinde tutarlı olmalı.
+DATE_FORMATS = [
+    # YYYY-M-D (tek haneli ay/gün yalnızca kelime sınırında)
+    ("ymd_any", r"\b(?P<ymd_any_y>\d{4})(?P<ymd_any_s>[./-])(?P<ymd_any_m>\d{1,2})(?P=ymd_any_s)(?P<ymd_any_d>\d{1,2})\b"),
+    # YYYY.MM.DD / YYYY/MM/DD / YYYY-MM-DD (boşluksuz, sınırsız)
+    ("ymd", r"(?P<ymd_y>\d{4})(?P<ymd_s>[./-])(?P<ymd_m>\d{2})(?P=ymd_s)(?P<ymd_d>\d{2})"),
+    # D.M.YYYY / DD.MM.YYYY
+    ("dmy", r"(?P<dmy_d>\d{1,2})(?P<dmy_s>[./-])(?P<dmy_m>\d{1,2})(?P=dmy_s)(?P<dmy_y>\d{4})"),
+    # DD.MM.YY (2 haneli yıl; DD.MM.YY olmazsa YY.MM.DD)
+    ("dmy2", r"\b(?P<dmy2_d>\d{2})(?P<dmy2_s>[./-])(?P<dmy2_m>\d{2})(?P=dmy2_s)(?P<dmy2_y>\d{2})\b"),
+    # YYYY MMM DD
+    ("y_mon_d", rf"(?P<y_mon_d_y>\d{{4}})\s+(?P<y_mon_d_m>{_MONTH_ALT})\s+(?P<y_mon_d_d>\d{{1,2}})"),
+    # DD MMM YYYY
+    ("d_mon_y", rf"(?P<d_mon_y_d>\d{{1,2}})\s+(?P<d_mon_y_m>{_MONTH_ALT})\s+(?P<d_mon_y_y>\d{{4}})"),
 ]
 
-def parse_date(s: str) -> Optional[datetime]:
-    s = s.strip()
-    
-    # Önce sayısal formatlar
-    formats = [
-        "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y",
-        "%Y-%m-%d", "%Y/%m/%d", "%Y.%m.%d",
-        "%d.%m.%y", "%d/%m/%y", "%d-%m-%y",  # 2 haneli yıl
-        "%y-%m-%d", "%y/%m/%d", "%y.%m.%d",
-        "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y",
-        "%Y.%m.%d", "%Y/%m/%d", "%Y-%m-%d",
-        "%d.%m.%y", "%d/%m/%y", "%d-%m-%y",
-        "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y",
-    ]
-    for fmt in formats:
-        try:
-            dt = datetime.strptime(s, fmt)
-            # 2 haneli yıl için 1900-2099 arası varsay
-            if dt.year < 100:
-                if dt.year < 50:
-                    dt = dt.replace(year=2000 + dt.year)
-                else:
-                    dt = dt.replace(year=1900 + dt.year)
-            return dt
-        except ValueError:
-            continue
-    
-    # Ay isimli formatlar (İngilizce)
-    month_names_en = {
-        "jan": "01", "feb": "02", "mar": "03", "apr": "04",
-        "may": "05", "jun": "06", "jul": "07", "aug": "08",
-        "sep": "09", "oct": "10", "nov": "11", "dec": "12",
-        "january": "01", "february": "02", "march": "03", "april": "04",
-        "june": "06", "july": "07", "august": "08", "september": "09",
-        "october": "10", "november": "11", "december": "12"
-    }
-    
-    # Türkçe ay isimleri
-    month_names_tr = {
-        "ocak": "01", "şubat": "02", "mart": "03", "nisan": "04",
-        "mayıs": "05", "haziran": "06", "temmuz": "07", "ağustos": "08",
-        "eylül": "09", "ekim": "10", "kasım": "11", "aralık": "12"
-    }
-    
-    s_lower = s.lower()
-    
-    # Pattern: DD MMM YYYY veya DD MMMM YYYY
-    for month_name, month_num in {**month_names_en, **month_names_tr}.items():
-        pattern = r"(\d{1,2})\s+" + re.escape(month_name) + r"\s+(\d{4})"
-        match = re.search(pattern, s_lower, re.IGNORECASE)
-        if match:
-            try:
-                day = int(match.group(1))
-                year = int(match.group(2))
-                if 1 <= day <= 31 and 1900 <= year <= 2100:
-                    return datetime(year, int(month_num), day)
-            except (ValueError, IndexError):
-                continue
-        
-        # Pattern: YYYY MMM DD
-        pattern = r"(\d{4})\s+" + re.escape(month_name) + r"\s+(\d{1,2})"
-        match = re.search(pattern, s_lower, re.IGNORECASE)
-        if match:
-            try:
-                year = int(match.group(1))
-                day = int(match.group(2))
-                if 1 <= day <= 31 and 1900 <= year <= 2100:
-                    return datetime(year, int(month_num), day)
-            except (ValueError, IndexError):
-                continue
-    
-    return None
+DATE_TOKEN_RE = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in DATE_FORMATS))
+
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _make_date(year: int, month: int, day: int) -> Optional[datetime]:
+    # strptime/datetime ile aynı geçerlilik kuralları, exception olmadan
+    if not (1 <= year <= 9999 and 1 <= month <= 12 and day >= 1):
+        return None
+    leap = month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    if day > _DAYS_IN_MONTH[month] + leap:
+        return None
+    return datetime(year, month, day)
+
+
+def _full_year(year: int) -> int:
+    # 4 haneli alandan gelen 0001-0099 yılları 1950-2049 aralığına taşınır
+    if year < 100:
+        return 2000 + year if year < 50 else 1900 + year
+    return year
+
+
+def _short_year(yy: int) -> int:
+    # strptime %y pivotu: 00-68 -> 20xx, 69-99 -> 19xx
+    return 2000 + yy if yy <= 68 else 1900 + yy
+
+
+def _parse_numeric(m: "re.Match", kind: str) -> Optional[datetime]:
+    year = int(m.group(kind + "_y"))
+    if year == 0:
+        return None
+    return _make_date(_full_year(year), int(m.group(kind + "_m")), int(m.group(kind + "_d")))
+
+
+def _parse_dmy2(m: "re.Match", kind: str) -> Optional[datetime]:
+    a, mo, b = int(m.group(kind + "_d")), int(m.group(kind + "_m")), int(m.group(kind + "_y"))
+    return _make_date(_short_year(b), mo, a) or _make_date(_short_year(a), mo, b)
+
+
+def _parse_month_name(m: "re.Match", kind: str) -> Optional[datetime]:
+    year, day = int(m.group(kind + "_y")), int(m.group(kind + "_d"))
+    if not (1 <= day <= 31 and 1900 <= year <= 2100):
+        return None
+    return _make_date(year, DATE_MONTHS[m.group(kind + "_m")], day)
+
+
+DATE_PARSERS: Dict[str, Callable[["re.Match", str], Optional[datetime]]] = {
+    "ymd_any": _parse_numeric,
+    "ymd": _parse_numeric,
+    "dmy": _parse_numeric,
+    "dmy2": _parse_dmy2,
+    "y_mon_d": _parse_month_name,
+    "d_mon_y": _parse_month_name,
+}
+
 
-def extract_dates(text: str, limit: int = 20) -> List[datetime]:
-    t = normalize_text(text)
-    found: List[datetime] = []
-    for p in DATE_PATTERNS:
-        for m in re.findall(p, t):
-            d = parse_date(m)
-            if d:
-                found.append(d)
-            if len(found) >= limit:
-                return found
+def iter_date_spans(t: str):
+    """
+    Tek geçişlik tarih tarayıcı: (start, end, datetime) üretir.
+    Metni normalize etmez; çağıran normalize edilmiş metni verir.
+    """
+    for m in DATE_TOKEN_RE.finditer(t):
+        kind = m.lastgroup
+        dt = DATE_PARSERS[kind](m, kind)
+        if dt is not None:
+            yield m.start(), m.end(), dt
+
+
+def parse_date(s: str) -> Optional[datetime]:
+    m = DATE_TOKEN_RE.fullmatch(s.strip().lower())
+    if not m:
+        return None
+    kind = m.lastgroup
+    return DATE_PARSERS[kind](m, kind)
+
+
+def extract_date_spans(text: str, limit: int = 20) -> List[Tuple[int, int, datetime]]:
+    # Span'ler normalize_text(text) üzerindeki konumlardır
+    found: List[Tuple[int, int, datetime]] = []
+    for span in iter_date_spans(normalize_text(text)):
+        found.append(span)
+        if len(found) >= limit:
+            break
     return found
 
-def extract_passport_expiry_date(text: str, pages: List[Dict[str, Any]]) -> Optional[datetime]:
+
+def extract_dates(text: str, limit: int = 20) -> List[datetime]:
+    return [dt for _, _, dt in extract_date_spans(text, limit)]
+
+# Geçerlilik ile ilgili keyword'ler (genişletilmiş)
+EXPIRY_KEYWORDS = [
+    "expiry", "expires", "expire", "expiry date", "exp date",
+    "date of expiry", "valid until", "valid to", "valid thru",
+    "validity", "validity date", "expiration", "expiration date",
+    "geçerlilik", "geçerlilik tarihi", "son geçerlilik",
+    "geçerli", "geçerli tarih", "bitiş tarihi", "son geçerli",
+    "exp", "exp.", "valid",
+]
+# Keyword ile tarih arasındaki en fazla karakter (aynı satırda, önde veya arkada)
+EXPIRY_WINDOW = 200
+
+EXPIRY_KEYWORD_RE = re.compile(
+    "|".join(re.escape(k) for k in sorted(set(EXPIRY_KEYWORDS), key=len, reverse=True))
+)
+
+
+def rank_expiry_candidates(tl: str) -> List[Dict[str, Any]]:
+    """
+    Keyword yakınlık indeksi: keyword konumları ve tarih span'leri birer kez
+    bulunur, tek sıralı taramada mesafeye göre eşleştirilir.
+    tl: normalize edilmiş, küçük harfli metin.
+    Dönüş: [{"date", "distance", "keyword", "side"}], en yakından uzağa.
+    """
+    keywords = [(m.start(), m.end(), m.group(0)) for m in EXPIRY_KEYWORD_RE.finditer(tl)]
+    if not keywords:
+        return []
+    dates = list(iter_date_spans(tl))
+    if not dates:
+        return []
+
+    # Satır sınırları: eski ".{0,200}" bağlamı gibi eşleşme satırı aşmaz
+    newlines = [i for i, ch in enumerate(tl) if ch == "\n"]
+
+    best: Dict[Tuple[int, int], Dict[str, Any]] = {}
+
+    def consider(ds: int, de: int, dt: datetime, distance: int, kw: str, side: str) -> None:
+        cur = best.get((ds, de))
+        if cur is None or distance < cur["distance"]:
+            best[(ds, de)] = {"date": dt, "distance": distance, "keyword": kw, "side": side}
+
+    # İleri tarama: tarihten önceki en yakın keyword (tarih keyword'ün arkasında)
+    k = n = 0
+    last_kw = None
+    last_nl = -1
+    for ds, de, dt in dates:
+        while k < len(keywords) and keywords[k][1] <= ds:
+            last_kw = keywords[k]
+            k += 1
+        while n < len(newlines) and newlines[n] < ds:
+            last_nl = newlines[n]
+            n += 1
+        if last_kw is not None and last_kw[0] > last_nl and de - last_kw[1] <= EXPIRY_WINDOW:
+            consider(ds, de, dt, ds - last_kw[1], last_kw[2], "after")
+
+    # Geri tarama: tarihten sonraki en yakın keyword (tarih keyword'ün önünde)
+    k, n = len(keywords) - 1, len(newlines) - 1
+    next_kw = None
+    next_nl = len(tl)
+    for ds, de, dt in reversed(dates):
+        while k >= 0 and keywords[k][0] >= de:
+            next_kw = keywords[k]
+            k -= 1
+        while n >= 0 and newlines[n] >= de:
+            next_nl = newlines[n]
+            n -= 1
+        if next_kw is not None and next_kw[1] <= next_nl and next_kw[0] - ds <= EXPIRY_WINDOW:
+            consider(ds, de, dt, next_kw[0] - de, next_kw[2], "before")
+
+    ranked = sorted(best.items(), key=lambda item: (item[1]["distance"], item[0][0]))
+    return [cand for _, cand in ranked]
+
+
+def extract_passport_expiry_date(
+    text: str,
+    pages: List[Dict[str, Any]],
+    ranked: Optional[List[Dict[str, Any]]] = None,
+    mrz: Optional[Dict[str, Any]] = None,
+) -> Optional[datetime]:
     """
     Pasaport için özel geçerlilik tarihi çıkarımı - ÇOK AGRESİF YAKLAŞIM.
-    Keyword'lerin yanındaki tarihleri, MRZ'dan tarih ve tüm sayıları tarar.
+    Check digit'leri tutan bir TD3 MRZ varsa geçerlilik doğrudan oradan alınır;
+    yoksa keyword'lerin yanındaki tarihleri, MRZ'dan tarih ve tüm sayıları tarar.
+    ranked: önceden hesaplanmış rank_expiry_candidates() sonucu (opsiyonel).
+    mrz: önceden hesaplanmış find_td3_mrz() sonucu (opsiyonel).
     """
     t = normalize_text(text)
+    if mrz is None:
+        mrz = find_td3_mrz(t)
+    if mrz is not None and mrz["valid"] and mrz["expiry_date"]:
+        return mrz["expiry_date"]
+
     tl = t.lower()
     tu = t.upper()
     
@@ -622,43 +2497,10 @@ def extract_passport_expiry_date(text: str, pages: List[Dict[str, Any]]) -> Opti
             except (ValueError, IndexError):
                 pass
     
-    # Geçerlilik ile ilgili keyword'ler (genişletilmiş)
-    expiry_keywords = [
-        "expiry", "expires", "expire", "expiry date", "exp date",
-        "date of expiry", "valid until", "valid to", "valid thru",
-        "validity", "validity date", "expiration", "expiration date",
-        "geçerlilik", "geçerlilik tarihi", "son geçerlilik",
-        "geçerli", "geçerli tarih", "bitiş tarihi", "son geçerli",
-        "exp", "exp.", "valid", "validity",
-    ]
-    
-    # Keyword'lerin yanındaki tarihleri bul (hem önünde hem arkasında)
-    expiry_candidates = []
-    
-    for keyword in expiry_keywords:
-        # Keyword'ün ARKASINDAKİ metni al (200 karakter)
-        pattern_after = re.escape(keyword) + r".{0,200}"
-        matches_after = re.finditer(pattern_after, tl, re.IGNORECASE)
-        for match in matches_after:
-            context = match.group(0)
-            for date_pattern in DATE_PATTERNS:
-                date_matches = re.findall(date_pattern, context)
-                for date_str in date_matches:
-                    parsed = parse_date(date_str)
-                    if parsed:
-                        expiry_candidates.append(parsed)
-        
-        # Keyword'ün ÖNÜNDEKİ metni al (200 karakter) - bazı dillerde tarih önce gelebilir
-        pattern_before = r".{0,200}" + re.escape(keyword)
-        matches_before = re.finditer(pattern_before, tl, re.IGNORECASE)
-        for match in matches_before:
-            context = match.group(0)
-            for date_pattern in DATE_PATTERNS:
-                date_matches = re.findall(date_pattern, context)
-                for date_str in date_matches:
-                    parsed = parse_date(date_str)
-                    if parsed:
-                        expiry_candidates.append(parsed)
+    # Keyword'lerin yanındaki tarihler (hem önünde hem arkasında)
+    if ranked is None:
+        ranked = rank_expiry_candidates(tl)
+    expiry_candidates = [c["date"] for c in ranked]
     
     # MRZ'dan tarih çıkar (YYMMDD formatı) - İYİLEŞTİRİLMİŞ
     # MRZ formatı: P<TUR...YYMMDD...YYMMDD (ilk doğum, ikinci geçerlilik)
@@ -687,7 +2529,10 @@ def extract_passport_expiry_date(text: str, pages: List[Dict[str, Any]]) -> Opti
                 continue
     
     # MRZ'dan gelen tarihleri ekle (genellikle ikinci tarih geçerlilik)
-    if len(mrz_dates) >= 2:
+    if mrz is not None and mrz["expiry_date"]:
+        # Kısmen doğrulanmış MRZ: belge no + geçerlilik check digit'i tutuyor
+        expiry_candidates.append(mrz["expiry_date"])
+    elif len(mrz_dates) >= 2:
         # İkinci tarih genellikle geçerlilik tarihi
         expiry_candidates.append(mrz_dates[1])
     elif len(mrz_dates) == 1:
@@ -825,7 +2670,9 @@ def extract_fields_by_type(
     # ----------------------------
     if doc_type == "passport":
         # Özel pasaport geçerlilik tarihi çıkarımı
-        expiry_date = extract_passport_expiry_date(text, pages)
+        ranked = rank_expiry_candidates(tl)
+        mrz = find_td3_mrz(t)
+        expiry_date = extract_passport_expiry_date(text, pages, ranked, mrz)
         
         # MRZ kontrolü için upper case
         tu = t.upper()
@@ -840,10 +2687,17 @@ def extract_fields_by_type(
         return {
             "dates_found": len(dates),
             "expiry_candidate": expiry_date.date().isoformat() if expiry_date else None,
-            "has_mrz_signal": ("p<" in tl) or ("mrz" in tl) or re.search(r"P<[A-Z<]{2,}", tu),
+            # Geçerlilik MRZ check digit'i veya keyword yakınlığıyla mı bulundu (yedek tarih değil)
+            "expiry_anchored": bool(ranked) or bool(mrz is not None and mrz["expiry_date"]),
+            "has_mrz_signal": bool(("p<" in tl) or ("mrz" in tl) or re.search(r"P<[A-Z<]{2,}", tu)),
+            "mrz": mrz_summary(mrz) if mrz else None,
             "all_dates": all_dates_str,  # Debug için
             "text_preview": text_preview,  # Debug için OCR metni
             "all_numbers": all_numbers,  # Debug için - tüm sayılar
+            "expiry_keyword_candidates": [  # Debug için - keyword'e en yakın tarihler
+                {"date": c["date"].date().isoformat(), "distance": c["distance"], "keyword": c["keyword"]}
+                for c in ranked[:5]
+            ],
             "text_length": len(text),  # OCR metni uzunluğu
         }
 
@@ -867,6 +2721,42 @@ def extract_fields_by_type(
     }
 
 
+# Koordinatı raporlanan alanlar: tarih değerleri ve bayrak alanlarının desenleri
+FIELD_REGION_DATES = ("expiry_candidate", "latest_date", "min_date", "max_date")
+FIELD_REGION_PATTERNS = {
+    "has_iban_term": re.compile(r"iban|\btr\d{24}\b"),
+    "has_schengen_term": re.compile(r"schengen"),
+    "has_coverage_30k": re.compile(r"30[.,\s]?000"),
+}
+
+
+def locate_field_regions(fields: Dict[str, Any], pages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Alan değerinin geçtiği ilk bölge: {alan: {"page", "kind", "bbox"}}.
+    Bölgeler ROI OCR'dan veya metin katmanı bloklarından gelir; yanıta
+    yalnızca koordinat girer, bölge metni girmez.
+    """
+    mrz_expiry = (fields.get("mrz") or {}).get("expiry_date")
+    out: Dict[str, Dict[str, Any]] = {}
+    for p in pages:
+        for g in p.get("regions", []):
+            loc = {"page": p["page"], "kind": g["kind"], "bbox": g["bbox"]}
+            tl = normalize_text(g.get("text", "")).lower()
+            dates = {dt.date().isoformat() for _, _, dt in iter_date_spans(tl)}
+            for key in FIELD_REGION_DATES:
+                value = fields.get(key)
+                if key in out or not value:
+                    continue
+                if value in dates or (g["kind"] == "mrz" and value == mrz_expiry):
+                    out[key] = loc
+            for key, rx in FIELD_REGION_PATTERNS.items():
+                if key not in out and fields.get(key) and rx.search(tl.replace(" ", "") if key == "has_iban_term" else tl):
+                    out[key] = loc
+            if g["kind"] == "mrz" and fields.get("mrz") and "mrz" not in out:
+                out["mrz"] = loc
+    return out
+
+
 # ----------------------------
 # 3) Kural motoru (role bazlı)
 # ----------------------------
@@ -1135,93 +3025,846 @@ def cross_document_date_check(
 
 
 # ----------------------------
-# API
+# Sonuç önbelleği (RAM only, yalnızca türetilmiş sonuçlar)
 # ----------------------------
-@app.get("/")
-def root():
-    return {"status": "api running"}
+# Ham OCR metni parçası taşıyan debug alanları önbelleğe girmez
+CACHE_EXCLUDED_FIELDS = ("text_preview", "all_numbers")
 
 
-@app.post("/analyze")
-async def analyze(
-    files: List[UploadFile] = File(...)
-) -> Dict[str, Any]:
+def analysis_config_version() -> str:
+    # Sonucu etkileyen ayarlar; biri değişirse aynı dosya farklı anahtar alır
+    return "|".join(str(x) for x in (
+        ANALYSIS_VERSION, OCR_STRATEGY, OCR_LANG_MODE, OCR_PREPROCESS, OCR_THRESHOLD,
+        OCR_RENDER_MODE, OCR_DPI, OCR_TEXT_LAYER, OCR_ENGINE, OCR_MRZ_FIRST, OCR_EARLY_STOP, MAX_PDF_PAGES,
+        OCR_ROI,
+    ))
 
-    start = time.time()
 
-    if not files:
-        raise HTTPException(status_code=400, detail="No files provided")
+class CacheBackend:
+    """
+    Sonuç önbelleği deposu: anahtar -> bayt, girdi başına TTL.
+    shared=True olan depolar süreç dışında tutar; değerleri ResultCache şifreler.
+    """
+    name = "base"
+    shared = False
 
-    file_results: List[Dict[str, Any]] = []
-    overall_status = "ok"
-    overall_reasons: List[str] = []
-    overall_actions: List[str] = []
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
 
-    def escalate_overall(s: str):
-        nonlocal overall_status
-        order = {"ok": 0, "warning": 1, "critical": 2}
-        if order[s] > order[overall_status]:
-            overall_status = s
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Süreç içi LRU + TTL (yalnızca RAM; süreç bitince kaybolur).
+    """
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                del self._items[key]
+                self.expirations += 1
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl_s, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SqliteCacheBackend(CacheBackend):
+    """
+    Aynı makinedeki uvicorn worker'ları arasında paylaşılan SQLite deposu
+    (varsayılan yol tmpfs üzerinde). Bağlantılar thread-local; WAL modu.
+    Süresi dolan girdiler yazma sırasında silinir, fazlası en eski erişime göre atılır.
+    """
+    name = "sqlite"
+    shared = True
+
+    def __init__(self, path: str, max_entries: int, timeout_s: float = RESULT_CACHE_TIMEOUT_S):
+        self.path = path
+        self.max_entries = max_entries
+        self.timeout_s = timeout_s
+        self._local = threading.local()
+        self.evictions = 0
+        self.expirations = 0
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS result_cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, "
+                "expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS result_cache_accessed ON result_cache (accessed)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout_s)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute(
+                "SELECT value, expires FROM result_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                self.expirations += 1
+                return None
+            conn.execute("UPDATE result_cache SET accessed = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO result_cache (key, value, expires, accessed) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl_s, now),
+            )
+            self.expirations += conn.execute(
+                "DELETE FROM result_cache WHERE expires < ?", (now,)
+            ).rowcount
+            self.evictions += conn.execute(
+                "DELETE FROM result_cache WHERE key IN ("
+                "SELECT key FROM result_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+
+    def clear(self) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM result_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        # evictions / expirations bu sürecin yaptığı silmeler
+        entries = self._conn().execute("SELECT COUNT(*) FROM result_cache").fetchone()[0]
+        return {
+            "entries": entries,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Pod'lar arası paylaşılan Redis (veya Redis protokolü konuşan) depo.
+    TTL SETEX ile sunucuda uygulanır; kapasite sunucunun maxmemory politikasına bırakılır.
+    """
+    name = "redis"
+    shared = True
+    prefix = "schengen-precheck:result:"
+
+    def __init__(self, url: str, timeout_s: float = RESULT_CACHE_TIMEOUT_S):
+        # Zaman aşımı olmadan erişilemeyen sunucu isteği süresiz bekletir
+        self._client = redis.Redis.from_url(
+            url, socket_timeout=timeout_s, socket_connect_timeout=timeout_s
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl_s: float) -> None:
+        self._client.set(self.prefix + key, value, ex=max(1, int(ttl_s)))
+
+    def clear(self) -> None:
+        for k in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(k)
+
+
+def make_cache_backend() -> CacheBackend:
+    """
+    RESULT_CACHE_BACKEND ayarına göre depo. Paylaşılan depolar için tüm
+    worker'ların aynı RESULT_CACHE_KEY'i kullanması ve şifreleme gerekir.
+    """
+    if RESULT_CACHE_BACKEND == "memory":
+        return MemoryCacheBackend(RESULT_CACHE_SIZE)
+    if RESULT_CACHE_BACKEND not in ("sqlite", "redis"):
+        raise RuntimeError(f"Unknown RESULT_CACHE_BACKEND: {RESULT_CACHE_BACKEND}")
+    if not RESULT_CACHE_SECRET:
+        raise RuntimeError(f"RESULT_CACHE_BACKEND={RESULT_CACHE_BACKEND} requires RESULT_CACHE_KEY")
+    if AESGCM is None:
+        raise RuntimeError(f"RESULT_CACHE_BACKEND={RESULT_CACHE_BACKEND} requires cryptography")
+    if RESULT_CACHE_BACKEND == "sqlite":
+        return SqliteCacheBackend(RESULT_CACHE_PATH, RESULT_CACHE_SIZE)
+    if redis is None:
+        raise RuntimeError("RESULT_CACHE_BACKEND=redis but redis is not installed")
+    return RedisCacheBackend(RESULT_CACHE_URL)
+
+
+class ResultCache:
+    """
+    Dosya başına analiz sonucu önbelleği (depo: CacheBackend).
+    Anahtar: HMAC-SHA256(dosya baytları, içerik türü, ayar sürümü); dosya
+    baytları ve ham OCR metni saklanmaz, yalnızca doc_type / fields / rule.
+    Paylaşılan depolarda değerler AES-GCM ile şifrelenir (anahtar sırdan
+    türetilir, önbellek anahtarı associated data olarak bağlanır).
+    """
+
+    def __init__(self, backend: Optional[CacheBackend], ttl_s: float, secret: bytes):
+        self.backend = backend
+        self.ttl_s = ttl_s
+        self._secret = secret
+        self._aead = None
+        if backend is not None and backend.shared:
+            self._aead = AESGCM(hmac.new(secret, b"result-cache-encryption", hashlib.sha256).digest())
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def key(self, data: bytes, content_type: str) -> str:
+        mac = hmac.new(self._secret, digestmod=hashlib.sha256)
+        mac.update(analysis_config_version().encode())
+        mac.update(b"\x00" + content_type.encode() + b"\x00")
+        mac.update(data)
+        return mac.hexdigest()
+
+    def _encode(self, key: str, value: Dict[str, Any]) -> bytes:
+        raw = json.dumps(value, ensure_ascii=False, default=str).encode()
+        if self._aead is None:
+            return raw
+        nonce = os.urandom(12)
+        return nonce + self._aead.encrypt(nonce, raw, key.encode())
+
+    def _decode(self, key: str, blob: bytes) -> Dict[str, Any]:
+        if self._aead is not None:
+            blob = self._aead.decrypt(blob[:12], blob[12:], key.encode())
+        return json.loads(blob)
+
+    def _count(self, attr: str) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + 1)
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        blob = self.backend.get(key)
+        return None if blob is None else self._decode(key, blob)
+
+    def _store(self, key: str, value: Dict[str, Any]) -> None:
+        self.backend.set(key, self._encode(key, value), self.ttl_s)
+
+    def _counted(self, value: Optional[Dict[str, Any]], failed: bool) -> Optional[Dict[str, Any]]:
+        # Depo erişilemez / zaman aşımı / sır değişmiş: hata + ıska, önbelleksiz devam
+        if failed:
+            self._count("errors")
+        self._count("misses" if value is None else "hits")
+        return value
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            return self._counted(self._lookup(key), False)
+        except Exception:
+            return self._counted(None, True)
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        try:
+            self._store(key, value)
+        except Exception:
+            self._count("errors")
+
+    async def _off_loop(self, fn: Callable[..., Any], *args: Any) -> Any:
+        # Paylaşılan depo (sqlite kilidi / redis ağı) event loop'u bloklamasın;
+        # RESULT_CACHE_TIMEOUT_S aşılırsa asyncio.TimeoutError. Sayaçlar çağıranda
+        # güncellenir: zaman aşımına uğrayan thread sonradan sayım yapmaz.
+        if not self.backend.shared:
+            return fn(*args)
+        return await asyncio.wait_for(asyncio.to_thread(fn, *args), RESULT_CACHE_TIMEOUT_S * 2)
+
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        try:
+            return self._counted(await self._off_loop(self._lookup, key), False)
+        except Exception:
+            return self._counted(None, True)
+
+    async def aput(self, key: str, value: Dict[str, Any]) -> None:
+        if not self.enabled:
+            return
+        try:
+            await self._off_loop(self._store, key, value)
+        except Exception:
+            self._count("errors")
+
+    def clear(self) -> None:
+        if self.enabled:
+            self.backend.clear()
+
+    def _counters(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend.name if self.backend else None,
+            "encrypted": self._aead is not None,
+            "max_entries": RESULT_CACHE_SIZE,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        out = self._counters()
+        if self.enabled:
+            try:
+                out.update(self.backend.stats())
+            except Exception:
+                pass
+        return out
+
+    async def astats(self) -> Dict[str, Any]:
+        # /cache/stats: sqlite COUNT / redis event loop dışında
+        out = self._counters()
+        if self.enabled:
+            try:
+                out.update(await self._off_loop(self.backend.stats))
+            except Exception:
+                pass
+        return out
+
+
+RESULT_CACHE = ResultCache(
+    make_cache_backend() if RESULT_CACHE_SIZE > 0 else None, RESULT_CACHE_TTL_S, RESULT_CACHE_KEY
+)
+
+
+def cacheable_result(file_result: Dict[str, Any]) -> Dict[str, Any]:
+    # Dosya meta verisi ve ham sayfa metni hariç, türetilmiş sonuçlar
+    fields = {k: v for k, v in file_result["fields"].items() if k not in CACHE_EXCLUDED_FIELDS}
+    return {
+        "doc_type": file_result["doc_type"],
+        "doc_role": file_result["doc_role"],
+        "pages_processed": file_result["pages_processed"],
+        "pages_total": file_result["pages_total"],
+        "ocr_passes": file_result["ocr_passes"],
+        "fields": fields,
+        "rule": file_result["rule"],
+    }
+
+
+# ----------------------------
+# Upload alımı (streaming, RAM only)
+# ----------------------------
+# Magic byte imzaları: istemcinin content_type'ına güvenilmez
+SNIFF_BYTES = 12
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+class UploadStream:
+    """
+    multipart/form-data gövdesini geldikçe ayrıştırır ("files" alanları).
+    - Dosya türü ilk baytlardan (magic) belirlenir; izinli değilse hemen 415
+    - Boyut her parçada kontrol edilir; MAX_FILE_MB aşılınca hemen 413
+    - Her dosya biter bitmez on_file(meta, data, ctype) çağrılır
+    Dosya baytları yalnızca RAM'de, dosya başına bir tampon.
+    """
+
+    def __init__(self, boundary: bytes, on_file: Callable[[Dict[str, Any], bytes, str], None]):
+        self._on_file = on_file
+        self._max_bytes = int(MAX_FILE_MB * 1024 * 1024)
+        self.files = 0
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        self._on_part_begin()
+
+    def write(self, chunk: bytes) -> None:
+        self._parser.write(chunk)
+
+    def finalize(self) -> None:
+        self._parser.finalize()
+
+    def _on_part_begin(self) -> None:
+        self._headers: Dict[bytes, bytes] = {}
+        self._field = b""
+        self._value = b""
+        self._buf: Optional[bytearray] = None
+        self._filename: Optional[str] = None
+        self._declared = ""
+        self._ctype: Optional[str] = None
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, params = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = params.get(b"filename")
+        # Dosya olmayan form alanları okunup atılır
+        if params.get(b"name") != b"files" or filename is None:
+            return
+        self.files += 1
+        if self.files > MAX_FILES_PER_REQUEST:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Too many files (max {MAX_FILES_PER_REQUEST})"
+            )
+        self._filename = filename.decode("utf-8", "replace")
+        self._declared = self._headers.get(b"content-type", b"").decode("latin-1").lower()
+        self._buf = bytearray()
 
-    for f in files:
-        ctype = (f.content_type or "").lower()
+    def _sniff(self) -> None:
+        ctype = sniff_content_type(bytes(self._buf[:SNIFF_BYTES]))
         if ctype not in ALLOWED_TYPES:
             raise HTTPException(
                 status_code=415,
-                detail=f"Unsupported file type: {ctype}"
+                detail=f"Unsupported file type: {self._filename} ({self._declared or 'unknown'})"
             )
+        self._ctype = ctype
 
-        data = await f.read()
-        size_mb = _mb(len(data))
-        if size_mb > MAX_FILE_MB:
-            del data
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._buf is None:
+            return
+        self._buf += data[start:end]
+        if len(self._buf) > self._max_bytes:
             raise HTTPException(
                 status_code=413,
-                detail=f"File too large: {f.filename} ({size_mb:.2f} MB)"
+                detail=f"File too large: {self._filename} (> {MAX_FILE_MB} MB)"
             )
+        if self._ctype is None and len(self._buf) >= SNIFF_BYTES:
+            self._sniff()
+
+    def _on_part_end(self) -> None:
+        if self._buf is None:
+            return
+        if self._ctype is None:
+            self._sniff()
+        # Tampon kopyalanmadan devredilir (bytes() dosya başına belleği ikiye katlardı);
+        # aşağı akıştaki okuyucular (PyMuPDF, PIL, HMAC) bytearray kabul eder
+        data, self._buf = self._buf, None
+        self._on_file(_safe_meta(self._filename, self._ctype, _mb(len(data))), data, self._ctype)
+
+
+async def read_upload_stream(
+    request: Request,
+    on_file: Callable[[Dict[str, Any], bytes, str], None]
+) -> int:
+    """
+    İstek gövdesini parça parça UploadStream'e verir; toplam gövde
+    MAX_REQUEST_MB'ı aşarsa (Content-Length'ten önceden ya da akış sırasında) 413.
+    Dönüş: alınan dosya sayısı.
+    """
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if ctype != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    max_body = int(MAX_REQUEST_MB * 1024 * 1024)
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_body:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Request too large ({_mb(int(declared)):.2f} MB, max {MAX_REQUEST_MB:g} MB)"
+        )
+
+    stream = UploadStream(boundary, on_file)
+    received = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            M_INGESTED_BYTES.inc(len(chunk))
+            if received > max_body:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Request too large (max {MAX_REQUEST_MB:g} MB)"
+                )
+            if chunk:
+                stream.write(chunk)
+        stream.finalize()
+    except MultipartParseError:
+        raise HTTPException(status_code=400, detail="Malformed multipart body")
+    return stream.files
+
+
+# Streaming alımda FastAPI parametresi yok; /docs için istek gövdesi şeması
+ANALYZE_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {"type": "array", "items": {"type": "string", "format": "binary"}},
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+# ----------------------------
+# API
+# ----------------------------
+@app.on_event("shutdown")
+def _shutdown_ocr_pool():
+    JOBS.cancel_all()
+    OCR_POOL.shutdown()
+
+
+@app.get("/")
+def root():
+    return {"status": "api running"}
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return await RESULT_CACHE.astats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> PlainTextResponse:
+    # Prometheus metin formatı; her uvicorn worker'ı kendi sayaçlarını raporlar
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def require_admin(request: Request) -> None:
+    token = request.headers.get("x-admin-token", "")
+    if not PROFILE_ADMIN_TOKEN or not hmac.compare_digest(token, PROFILE_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.get("/admin/profile")
+def get_profile(request: Request, format: str = "folded"):
+    """
+    Örneklenen isteklerin birleşik stack'leri. format=folded (flamegraph.pl /
+    speedscope girdisi) veya format=json (özet + en sık stack'ler).
+    """
+    require_admin(request)
+    if format == "json":
+        return PROFILER.summary()
+    return PlainTextResponse(PROFILER.folded())
+
+
+@app.delete("/admin/profile")
+def reset_profile(request: Request) -> Dict[str, Any]:
+    require_admin(request)
+    PROFILER.reset()
+    return {"status": "reset"}
+
+
+def want_timings(request: Request) -> bool:
+    # ?timings=1: dosya başına aşama süreleri yanıtta kalır
+    return request.query_params.get("timings", "").lower() in ("1", "true", "yes")
+
+
+# Ham OCR metni / debug dökümü taşıyan alanlar; yalnızca "debug" profilinde döner
+DEBUG_FIELDS = ("text_preview", "all_numbers", "all_dates", "expiry_keyword_candidates")
+MINIMAL_KEYS = (
+    "file", "doc_type", "doc_role", "pages_processed", "pages_total",
+    "fields", "rule", "cache_hit", "timings",
+)
+
+
+def response_profile(request: Request) -> str:
+    profile = request.query_params.get("profile", RESPONSE_PROFILE).lower()
+    if profile not in RESPONSE_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown profile: {profile} (expected one of {', '.join(RESPONSE_PROFILES)})",
+        )
+    return profile
+
 
-        meta = _safe_meta(f, size_mb)
+def _without_text(d: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in d.items() if k != "text"}
 
-        # 1) OCR (RAM)
-        ocr_out = extract_text_kvkk_safe(data, ctype)
-        text = ocr_out["text"]
-        pages = ocr_out.get("pages", [])
 
+def shape_file_result(fr: Dict[str, Any], profile: str, timings: bool) -> Dict[str, Any]:
+    """
+    Dosya sonucunu yanıt profiline indirger. Analiz, metrikler ve önbellek
+    tam sonucu kullandıktan sonra çağrılır.
+    """
+    if not timings:
+        fr.pop("timings", None)
+        for p in fr.get("pages", []):
+            p.pop("timings", None)
+    if profile == "debug":
+        return fr
+    fr["fields"] = {k: v for k, v in fr["fields"].items() if k not in DEBUG_FIELDS}
+    if "llm_payload_preview" in fr:
+        # Önizleme aynı alan sözlüğünü taşır; süzülmüş kopyayı göstermeli
+        fr["llm_payload_preview"] = {**fr["llm_payload_preview"], "fields": fr["fields"]}
+    pages = []
+    for p in fr.get("pages", []):
+        slim = _without_text(p)
+        if "regions" in p:
+            slim["regions"] = [_without_text(g) for g in p["regions"]]
+        pages.append(slim)
+    fr["pages"] = pages
+    if profile == "minimal":
+        return {k: fr[k] for k in MINIMAL_KEYS if k in fr}
+    return fr
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if np is not None and isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def encode_json(payload: Any) -> bytes:
+    # orjson varsa onunla, yoksa stdlib; her iki yol da jsonable_encoder'ı atlar
+    if orjson is not None:
+        return orjson.dumps(
+            payload, default=_json_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    return json.dumps(payload, ensure_ascii=False, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    return Response(encode_json(payload), status_code=status_code, media_type="application/json")
+
+
+def analyze_file(meta: Dict[str, Any], ocr_out: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Tek dosyanın OCR çıktısından tür tespiti, alan çıkarımı ve kural sonucu.
+    "timings": sayfaların OCR aşamaları + analiz aşamaları (ms, çağrı sayısı).
+    """
+    text = ocr_out["text"]
+    pages = ocr_out.get("pages", [])
+
+    timings = StageTimings()
+    for p in pages:
+        timings.merge(p.get("timings", {}))
+
+    with collect_timings() as analysis:
         # 2) Belge türü + rol
-        doc_type = detect_doc_type(text)
+        with stage("detect_doc_type"):
+            doc_type = detect_doc_type(text)
         doc_role = DOC_ROLE.get(doc_type, "IRRELEVANT")
 
         # 3) Alan çıkarımı (PAGE AWARE)
-        fields = extract_fields_by_type(doc_type, text, pages)
+        with stage("extract_fields"):
+            fields = extract_fields_by_type(doc_type, text, pages)
+            regions = locate_field_regions(fields, pages)
+            if regions:
+                fields["regions"] = regions
         fields["pages_processed"] = ocr_out["pages_processed"]
 
         # 4) Kural motoru
-        rule_res = rule_engine(doc_type, fields)
+        with stage("rule_engine"):
+            rule_res = rule_engine(doc_type, fields)
+    timings.merge(analysis.as_dict())
 
-        # Overall birleştirme
-        escalate_overall(rule_res["status"])
-        overall_reasons += rule_res["reasons"]
-        overall_actions += rule_res["actions"]
+    return {
+        "file": meta,
+        "doc_type": doc_type,
+        "doc_role": doc_role,
+        "pages_processed": ocr_out["pages_processed"],
+        "pages_total": ocr_out.get("pages_total", ocr_out["pages_processed"]),
+        "ocr_passes": [
+            {"page": p["page"], "method": p.get("method", "ocr"), "passes": p.get("ocr_passes", [])}
+            for p in pages
+        ],
+        "pages": pages,  # ✅ taşındı
+        "fields": fields,
+        "rule": rule_res,
+        "llm_payload_preview": build_llm_payload(
+            doc_type, fields, rule_res
+        ),
+        "timings": timings.as_dict(),
+    }
 
-        file_results.append({
-            "file": meta,
-            "doc_type": doc_type,
-            "doc_role": doc_role,
-            "pages_processed": ocr_out["pages_processed"],
-            "pages": pages,  # ✅ taşındı
-            "fields": fields,
-            "rule": rule_res,
-            "llm_payload_preview": build_llm_payload(
-                doc_type, fields, rule_res
-            ),
-        })
 
+def record_file_metrics(fr: Dict[str, Any]) -> None:
+    M_FILES.inc(doc_type=fr["doc_type"], cache="hit" if fr["cache_hit"] else "miss")
+    if fr["cache_hit"]:
+        return
+    for p in fr["pages"]:
+        M_PAGES.inc(method=p.get("method", "ocr"))
+    M_PAGES_SKIPPED.inc(fr["pages_total"] - fr["pages_processed"])
+    for name, t in fr["timings"].items():
+        M_STAGE_SECONDS.observe(t["ms"] / 1000, stage=name)
+    M_TESSERACT_CALLS.inc(fr["timings"].get("tesseract", {}).get("calls", 0))
+
+
+def cached_file_result(meta: Dict[str, Any], hit: Dict[str, Any]) -> Dict[str, Any]:
+    # Önbellekten: ham sayfa metni yok, yalnızca türetilmiş sonuçlar
+    fr = {"file": meta, **hit, "pages": []}
+    fr["llm_payload_preview"] = build_llm_payload(fr["doc_type"], fr["fields"], fr["rule"])
+    fr["timings"] = {}
+    fr["cache_hit"] = True
+    return fr
+
+
+async def analyze_upload(
+    ticket: OcrTicket,
+    sequential: asyncio.Lock,
+    meta: Dict[str, Any],
+    data: bytes,
+    ctype: str,
+) -> Dict[str, Any]:
+    """
+    Tek yüklenen dosya: önbellek -> OCR (havuzda) -> analyze_file (havuzda).
+    OCR_FANOUT kapalıysa `sequential` kilidi dosyaları geliş sırasıyla tek tek OCR'latır.
+    Önbellek anahtarı (dosya başına ~10 MB'a kadar HMAC) event loop dışında hesaplanır.
+    """
+    key = await asyncio.to_thread(RESULT_CACHE.key, data, ctype) if RESULT_CACHE.enabled else ""
+    hit = await RESULT_CACHE.aget(key)
+    if hit is not None:
+        # Önbellekte olan dosyanın baytları OCR'a gitmez, hemen bırakılır
+        del data
+        fr = cached_file_result(meta, hit)
+        record_file_metrics(fr)
+        return fr
+
+    t0 = time.perf_counter()
+    try:
+        if OCR_FANOUT:
+            ocr_out = await ocr_file_fanout(ticket, data, ctype)
+        else:
+            async with sequential:
+                ocr_out = await ticket.run(extract_text_kvkk_safe, data, ctype)
         # KVKK-safe cleanup
-        del text
-        del pages
-        del ocr_out
         del data
-        await f.close()
+        ocr_wall_ms = (time.perf_counter() - t0) * 1000
+        # Tür skorlama + alan çıkarımı da CPU işi: OCR ile aynı havuz ve süre sınırı
+        fr = await ticket.run(analyze_file, meta, ocr_out)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"OCR timed out after {OCR_TIMEOUT_S:.0f}s"
+        )
+    del ocr_out
+    # Havuz kuyruğu + paralel sayfalar dahil, dosyanın OCR'ı için geçen gerçek süre
+    fr["timings"]["ocr_wall"] = {"ms": round(ocr_wall_ms, 2), "calls": 1}
+    await RESULT_CACHE.aput(key, cacheable_result(fr))
+    fr["cache_hit"] = False
+    record_file_metrics(fr)
+    return fr
+
+
+def admit_ocr_request() -> OcrTicket:
+    # Backpressure: havuz doluysa gövdeyi okumadan 429
+    try:
+        return OCR_POOL.admit()
+    except OcrQueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="OCR queue is full, please retry later",
+            headers={"Retry-After": str(OCR_RETRY_AFTER_S)},
+        )
+
+
+async def start_analysis(request: Request, ticket: OcrTicket) -> List["asyncio.Task[Dict[str, Any]]"]:
+    """
+    Gövdeyi streaming okur; her dosya yüklenmesi biter bitmez onun için bir
+    analyze_upload görevi başlatır. Görevler dosya sırasıyla döner.
+    Okuma hata verirse (413/415/400) başlamış görevler iptal edilir.
+    """
+    tasks: List["asyncio.Task[Dict[str, Any]]"] = []
+    sequential = asyncio.Lock()
+
+    def on_file(meta: Dict[str, Any], data: bytes, ctype: str) -> None:
+        tasks.append(asyncio.ensure_future(analyze_upload(ticket, sequential, meta, data, ctype)))
+
+    try:
+        if not await read_upload_stream(request, on_file):
+            raise HTTPException(status_code=400, detail="No files provided")
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return tasks
+
+
+def summarize_analysis(file_results: List[Dict[str, Any]], start: float) -> Dict[str, Any]:
+    """
+    Dosya sonuçlarından genel durum + belgeler arası kontrol (/analyze yanıtı).
+    """
+    overall_status = "ok"
+    overall_reasons: List[str] = []
+    overall_actions: List[str] = []
+
+    def escalate_overall(s: str):
+        nonlocal overall_status
+        order = {"ok": 0, "warning": 1, "critical": 2}
+        if order[s] > order[overall_status]:
+            overall_status = s
+
+    # Overall birleştirme
+    for fr in file_results:
+        rule_res = fr["rule"]
+        escalate_overall(rule_res["status"])
+        overall_reasons += rule_res["reasons"]
+        overall_actions += rule_res["actions"]
 
     # 🔥 5️⃣ Belgeler arası tarih uyumu
     cross = cross_document_date_check(file_results)
@@ -1246,8 +3889,288 @@ async def analyze(
         "status": overall_status,
         "reasons": overall_reasons,
         "actions": overall_actions,
+        "cross_check": cross,
         "files_received": [fr["file"] for fr in file_results],
         "file_results": file_results,
         "processing_ms": int((time.time() - start) * 1000),
         "storage_policy": "no_persist",
-    }
\ No newline at end of file
+    }
+
+
+@app.post("/analyze", openapi_extra=ANALYZE_OPENAPI)
+async def analyze(request: Request) -> Response:
+
+    start = time.time()
+    profile = response_profile(request)
+    timings = want_timings(request)
+
+    profiling = PROFILER.request() if PROFILER.should_sample() else nullcontext()
+    try:
+        ticket = admit_ocr_request()
+        try:
+            # 0) Streaming okuma + doğrulama, 1) dosya başına OCR + analiz
+            with profiling:
+                tasks = await start_analysis(request, ticket)
+                file_results = await _gather_ocr(tasks)
+        finally:
+            ticket.close()
+    except HTTPException as e:
+        M_REJECTED.inc(status=str(e.status_code))
+        raise
+    finally:
+        M_REQUEST_SECONDS.observe(time.time() - start, endpoint="/analyze")
+
+    file_results = [shape_file_result(fr, profile, timings) for fr in file_results]
+    return json_response(summarize_analysis(file_results, start))
+
+
+# ----------------------------
+# Asenkron iş (job) API: POST /jobs, GET /jobs/{id}, GET /jobs/{id}/events (SSE)
+# ----------------------------
+class AnalysisJob:
+    """
+    Tek bir yüklemenin arka planda çalışan analizi. Her dosya bitince bir
+    olay eklenir; abone olan SSE akışları Condition ile uyandırılır.
+    Yalnızca RAM; bittikten JOB_TTL_S saniye sonra JobStore'dan silinir.
+    """
+
+    def __init__(self, job_id: str, files: int):
+        self.id = job_id
+        self.files = files
+        self.status = "running"
+        self.events: List[Dict[str, Any]] = []
+        self.file_results: Dict[int, Dict[str, Any]] = {}
+        self.errors: Dict[int, Dict[str, Any]] = {}
+        self.result: Optional[Dict[str, Any]] = None
+        self.expires_at: Optional[float] = None
+        self.runner: Optional["asyncio.Task[None]"] = None
+        # ?timings=1 ile oluşturulduysa dosya sonuçlarında aşama süreleri kalır
+        self.timings = False
+        self.profile = RESPONSE_PROFILE
+        self._cond = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status != "running"
+
+    async def _emit(self, event: str, data: Any) -> None:
+        async with self._cond:
+            self.events.append({"id": len(self.events), "event": event, "data": data})
+            self._cond.notify_all()
+
+    async def file_done(self, index: int, fr: Dict[str, Any]) -> None:
+        fr = shape_file_result(fr, self.profile, self.timings)
+        self.file_results[index] = fr
+        await self._emit("file_result", {"index": index, **fr})
+
+    async def file_failed(self, index: int, status_code: int, detail: str) -> None:
+        err = {"index": index, "status_code": status_code, "detail": detail}
+        self.errors[index] = err
+        await self._emit("file_error", err)
+
+    async def finish(self, status: str, result: Optional[Dict[str, Any]]) -> None:
+        self.result = result
+        self.status = status
+        self.expires_at = time.monotonic() + JOB_TTL_S
+        if result is not None:
+            await self._emit("cross_check", result["cross_check"])
+        await self._emit("done", {"status": status, "result": self.summary()})
+
+    async def wait_events(self, since: int) -> List[Dict[str, Any]]:
+        # since: ilk istenen olay numarası; yeni olay yoksa iş bitene kadar bekle
+        async with self._cond:
+            while len(self.events) <= since and not self.finished:
+                await self._cond.wait()
+            return self.events[since:]
+
+    def summary(self) -> Optional[Dict[str, Any]]:
+        # Genel sonuç; dosya sonuçları ayrıca (olaylar / snapshot) gönderilir
+        if self.result is None:
+            return None
+        return {k: v for k, v in self.result.items() if k not in ("file_results", "files_received")}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "files": self.files,
+            "completed": len(self.file_results) + len(self.errors),
+            "file_results": [self.file_results[i] for i in sorted(self.file_results)],
+            "errors": [self.errors[i] for i in sorted(self.errors)],
+            "result": self.summary(),
+        }
+
+
+class JobStore:
+    """
+    Süreç içi iş kaydı: en fazla JOB_MAX iş; bitmiş işler TTL sonrası silinir.
+    Yer, yükleme okunmadan önce reserve() ile ayrılır ve create() ile işe
+    dönüşür (ya da release() ile bırakılır); eşzamanlı POST'lar JOB_MAX'ı aşamaz.
+    """
+
+    def __init__(self, max_jobs: int):
+        self.max_jobs = max(1, max_jobs)
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._reserved = 0
+        self._lock = threading.Lock()
+
+    def purge(self) -> None:
+        now = time.monotonic()
+        for job_id in [j.id for j in self._jobs.values() if j.expires_at and j.expires_at < now]:
+            del self._jobs[job_id]
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def reserve(self) -> bool:
+        # Kontrol ve ayırma tek adımda; yer yoksa False (çağıran 429 döner)
+        with self._lock:
+            self.purge()
+            if len(self._jobs) + self._reserved >= self.max_jobs:
+                return False
+            self._reserved += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._reserved -= 1
+
+    def create(self, files: int) -> AnalysisJob:
+        # reserve() ile ayrılmış yeri kullanır
+        job = AnalysisJob(os.urandom(16).hex(), files)
+        with self._lock:
+            self._reserved -= 1
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> AnalysisJob:
+        self.purge()
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Job not found or expired")
+        return job
+
+    def cancel_all(self) -> None:
+        for job in self._jobs.values():
+            if job.runner is not None:
+                job.runner.cancel()
+        self._jobs.clear()
+
+
+JOBS = JobStore(JOB_MAX)
+
+
+async def run_job(
+    job: AnalysisJob,
+    ticket: OcrTicket,
+    tasks: List["asyncio.Task[Dict[str, Any]]"],
+    start: float,
+) -> None:
+    """
+    Dosya görevlerini bekler; her biri bitince olay yayınlar, en son
+    belgeler arası kontrol ile özet. Hatalı dosyalar özetten çıkarılır.
+    """
+    async def one(index: int, task: "asyncio.Task[Dict[str, Any]]") -> None:
+        try:
+            fr = await task
+        except HTTPException as e:
+            await job.file_failed(index, e.status_code, str(e.detail))
+        except Exception:
+            await job.file_failed(index, 500, "Analysis failed")
+        else:
+            await job.file_done(index, fr)
+
+    try:
+        await asyncio.gather(*(one(i, t) for i, t in enumerate(tasks)))
+        done = [job.file_results[i] for i in sorted(job.file_results)]
+        await job.finish("done" if not job.errors else "partial", summarize_analysis(done, start))
+        M_REQUEST_SECONDS.observe(time.time() - start, endpoint="/jobs")
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        # expires_at + "done" olayı: iş TTL ile silinir, SSE akışları uyanıp kapanır
+        await job.finish("cancelled", None)
+        raise
+    except Exception:
+        await job.finish("failed", None)
+    finally:
+        ticket.close()
+
+
+@app.post("/jobs", status_code=202, openapi_extra=ANALYZE_OPENAPI)
+async def create_job(request: Request) -> Dict[str, Any]:
+    """
+    /analyze ile aynı girdi; yükleme bitince iş id'si hemen döner,
+    OCR arka planda sürer.
+    """
+    start = time.time()
+    profile = response_profile(request)
+
+    if not JOBS.reserve():
+        raise HTTPException(
+            status_code=429,
+            detail="Too many active jobs, please retry later",
+            headers={"Retry-After": str(OCR_RETRY_AFTER_S)},
+        )
+
+    try:
+        ticket = admit_ocr_request()
+        try:
+            tasks = await start_analysis(request, ticket)
+        except BaseException:
+            ticket.close()
+            raise
+    except BaseException as e:
+        JOBS.release()
+        if isinstance(e, HTTPException):
+            M_REJECTED.inc(status=str(e.status_code))
+        raise
+
+    job = JOBS.create(len(tasks))
+    job.timings = want_timings(request)
+    job.profile = profile
+    job.runner = asyncio.ensure_future(run_job(job, ticket, tasks, start))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "files": job.files,
+        "poll": f"/jobs/{job.id}",
+        "events": f"/jobs/{job.id}/events",
+    }
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> Response:
+    return json_response(JOBS.get(job_id).snapshot())
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    data = encode_json(event["data"]).decode("utf-8")
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request) -> StreamingResponse:
+    """
+    Server-Sent Events: file_result / file_error (dosya bittikçe),
+    cross_check ve done (en son). Last-Event-ID ile kaldığı yerden devam eder.
+    """
+    job = JOBS.get(job_id)
+    last = request.headers.get("last-event-id", "")
+    since = int(last) + 1 if last.isdigit() else 0
+
+    async def stream():
+        nonlocal since
+        while True:
+            events = await job.wait_events(since)
+            for event in events:
+                yield _sse(event)
+            since += len(events)
+            if job.finished and since >= len(job.events):
+                return
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
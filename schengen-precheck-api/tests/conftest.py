@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Testler schengen-precheck-api/ altındaki main.py ve bench.py'yi doğrudan içe aktarır
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
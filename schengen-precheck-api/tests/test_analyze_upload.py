@@ -0,0 +1,45 @@
+import asyncio
+import threading
+
+import main
+
+TEXT = "PASAPORT / PASSPORT\nDate of birth 12.05.1990\nDate of expiry 01.02.2030\n"
+
+
+def test_cache_key_and_analysis_run_off_event_loop(monkeypatch):
+    threads = {}
+
+    async def fake_fanout(ticket, data, ctype):
+        page = {"page": 1, "method": "ocr", "text": TEXT, "ocr_passes": []}
+        return {"text": TEXT, "pages_processed": 1, "pages_total": 1, "pages": [page]}
+
+    real_analyze, real_key = main.analyze_file, main.RESULT_CACHE.key
+
+    def analyze(meta, ocr_out):
+        threads["analyze"] = threading.get_ident()
+        return real_analyze(meta, ocr_out)
+
+    def key(data, ctype):
+        threads["key"] = threading.get_ident()
+        return real_key(data, ctype)
+
+    monkeypatch.setattr(main, "OCR_FANOUT", True)
+    monkeypatch.setattr(main, "ocr_file_fanout", fake_fanout)
+    monkeypatch.setattr(main, "analyze_file", analyze)
+    monkeypatch.setattr(main.RESULT_CACHE, "key", key)
+    main.RESULT_CACHE.clear()
+
+    async def go():
+        ticket = main.OCR_POOL.admit()
+        try:
+            meta = {"filename": "p.pdf", "content_type": "application/pdf", "size_mb": 0.0}
+            fr = await main.analyze_upload(ticket, asyncio.Lock(), meta, b"%PDF-unique-bytes", "application/pdf")
+        finally:
+            ticket.close()
+        return threading.get_ident(), fr
+
+    loop_thread, fr = asyncio.run(go())
+    main.RESULT_CACHE.clear()
+    assert fr["doc_type"] == "passport" and fr["cache_hit"] is False
+    assert set(threads) == {"analyze", "key"}
+    assert loop_thread not in threads.values()
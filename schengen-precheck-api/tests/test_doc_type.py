@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+import bench
+import main
+
+HANDWRITTEN = [
+    "",
+    "PASAPORT / PASSPORT\nTÜRKİYE CUMHURİYETİ\nP<TURDOE<<JOHN<<<<<<<<<<<<<<<<<<<<<<<<<<<<<<\nU123456786TUR9001012M3001015<<<<<<<<<<<<<<02",
+    "Passport No 12345678 surname given name",
+    "Hesap Özeti / Account Statement\nIBAN TR12 0006 2000 1234 0000 0000 12\nClosing balance 12.500,00",
+    "TRAVEL HEALTH INSURANCE policy schengen coverage 30.000 EUR medical expenses",
+    "E-TICKET itinerary PNR ABC123 Departure IST Arrival MUC Lufthansa",
+    "Hotel booking confirmation check-in 01.06 check-out 05.06, 4 nights, guest",
+    "Invitation letter: I will host my friend at my address, signature",
+    "Employer letter - paid leave granted, position: engineer, department: R&D, salary",
+    "SGK 4A hizmet dökümü prim günleri",
+    "öğrenci belgesi faculty department enrolled transcript gpa ects",
+    "Residence permit / oturum izni; marriage certificate; nüfus kayıt örneği vukuatlı",
+    "MRZ MRZ mrz <<<<<<<<<< TUR123456",
+    "lorem ipsum dolor sit amet",
+]
+
+
+def texts():
+    rng = random.Random(7)
+    return HANDWRITTEN + [bench.synthetic_ocr_text(rng, size=5_000) for _ in range(150)]
+
+
+@pytest.fixture(params=["automaton", "scan"])
+def matcher(request, monkeypatch):
+    # Aynı skorlar hem Aho–Corasick otomatıyla hem `in` taramasıyla çıkmalı
+    if request.param == "automaton":
+        if main.ahocorasick is None:
+            pytest.skip("pyahocorasick not installed")
+        return main._DOC_TYPE_MATCHER
+    monkeypatch.setattr(main, "ahocorasick", None)
+    m, weights, patterns = main._compile_doc_type_spec()
+    monkeypatch.setattr(main, "_DOC_TYPE_MATCHER", m)
+    assert m._automaton is None
+    return m
+
+
+def test_scores_match_frozen_baseline(matcher):
+    mismatches = [t[:60] for t in texts() if main.score_doc_types(t) != bench.reference_score_doc_types(t)]
+    assert mismatches == []
+
+
+def test_detect_doc_type_matches_baseline(matcher):
+    def baseline_detect(text):
+        scores = bench.reference_score_doc_types(text)
+        best = max(scores, key=scores.get)
+        if scores[best] == 0:
+            return "unknown"
+        return best if scores[best] >= main.CONFIDENCE_THRESHOLD else "irrelevant_document"
+
+    for t in texts():
+        assert main.detect_doc_type(t) == baseline_detect(t)
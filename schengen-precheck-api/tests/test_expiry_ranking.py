@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import bench
+import main
+
+
+def ranked(text):
+    tl = main.normalize_text(text).lower()
+    return [(c["date"].date().isoformat(), c["keyword"], c["side"]) for c in main.rank_expiry_candidates(tl)]
+
+
+def expiry(text):
+    dt = main.extract_passport_expiry_date(text, [])
+    return dt.date().isoformat() if dt else None
+
+
+def test_issue_and_expiry_on_separate_lines():
+    text = "Date of issue 01.02.2020\nDate of expiry 01.02.2030\nDate of birth 12.05.1990\n"
+    # Veriliş / doğum satırlarında keyword yok: yalnızca geçerlilik sıralanır
+    assert ranked(text) == [("2030-02-01", "date of expiry", "after")]
+    assert expiry(text) == "2030-02-01"
+
+
+def test_issue_and_expiry_on_one_line():
+    # Veriliş tarihi sonraki keyword'e de yakın; en geç gelecek tarih seçilir
+    text = "Date of issue 01.02.2020 Date of expiry 01.02.2030"
+    dates = {d for d, _, _ in ranked(text)}
+    assert dates == {"2020-02-01", "2030-02-01"}
+    assert expiry(text) == "2030-02-01"
+
+
+def test_nearest_keyword_ranks_first():
+    text = "Valid until 15.03.2029 ........ 01.01.2031\n"
+    got = ranked(text)
+    assert got[0][0] == "2029-03-15"
+    assert [d for d, _, _ in got] == ["2029-03-15", "2031-01-01"]
+
+
+def test_keyword_after_date():
+    text = "15.03.2029 (son geçerlilik tarihi)\n"
+    [(date, keyword, side)] = ranked(text)
+    assert (date, side) == ("2029-03-15", "before")
+    assert keyword.startswith("son geçerlilik")
+
+
+def test_keyword_on_line_above_is_not_anchored():
+    # Eşleşme satırı aşmaz (eski ".{0,200}" davranışı): etiket üstteki satırdaysa
+    # tarih keyword'e bağlanmaz, yalnızca en büyük tarih yedeğiyle seçilir
+    text = "Date of expiry / Son geçerlilik tarihi\n01.02.2030\nDate of birth\n12.05.1990\n"
+    assert ranked(text) == []
+    assert expiry(text) == "2030-02-01"
+    fields = main.extract_fields_by_type("passport", text, [])
+    assert fields["expiry_candidate"] == "2030-02-01"
+    assert fields["expiry_anchored"] is False
+
+
+def test_valid_mrz_wins_over_printed_expiry():
+    line1, line2 = bench.synthetic_mrz(datetime(2031, 4, 15))
+    text = f"Date of expiry 01.02.2035\n{line1}\n{line2}\n"
+    assert ranked(text)[0][0] == "2035-02-01"
+    # Check digit'leri tutan MRZ basılı tarihten önce gelir
+    assert expiry(text) == "2031-04-15"
+
+
+def test_broken_mrz_falls_back_to_printed_expiry():
+    line1, line2 = bench.synthetic_mrz(datetime(2031, 4, 15))
+    line2 = line2[:21] + "350415" + line2[27:]
+    text = f"Date of expiry 01.02.2030\n{line1}\n{line2}\n"
+    assert main.find_td3_mrz(main.normalize_text(text)) is None
+    assert expiry(text) == "2030-02-01"
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    """6 sayfalık sahte PDF: OCR çağrıları sayılır, belge `complete_after` sayfada tamamlanır."""
+    state = {"calls": [], "complete_after": 1}
+    lock = threading.Lock()
+
+    def ocr_page(data, index):
+        with lock:
+            state["calls"].append(index)
+        return {"page": index + 1, "method": "ocr", "text": f"sayfa {index + 1}", "ocr_passes": []}
+
+    monkeypatch.setattr(main, "pdf_page_count", lambda data: 6)
+    monkeypatch.setattr(main, "ocr_pdf_page_bytes", ocr_page)
+    monkeypatch.setattr(main, "document_complete", lambda pages: len(pages) >= state["complete_after"])
+    monkeypatch.setattr(main, "OCR_EARLY_STOP", True)
+    return state
+
+
+def _run(data=b"%PDF"):
+    async def go():
+        ticket = main.OCR_POOL.admit()
+        try:
+            return await main.ocr_file_fanout(ticket, data, "application/pdf")
+        finally:
+            ticket.close()
+    return asyncio.run(go())
+
+
+def test_complete_first_page_submits_only_that_page(fake_pdf):
+    out = _run()
+    assert out["pages_processed"] == 1
+    assert out["pages_total"] == 6
+    assert fake_pdf["calls"] == [0]
+
+
+def test_later_pages_are_windowed(fake_pdf, monkeypatch):
+    monkeypatch.setattr(main, "OCR_EARLY_STOP_WINDOW", 2)
+    fake_pdf["complete_after"] = 3
+    out = _run()
+    assert [p["page"] for p in out["pages"]] == [1, 2, 3]
+    # En fazla pencere - 1 sayfa boşa gider
+    assert len(fake_pdf["calls"]) <= 3 + 1
+
+
+def test_without_early_stop_all_pages_in_order(fake_pdf, monkeypatch):
+    monkeypatch.setattr(main, "OCR_EARLY_STOP", False)
+    out = _run()
+    assert [p["page"] for p in out["pages"]] == [1, 2, 3, 4, 5, 6]
+    assert sorted(fake_pdf["calls"]) == list(range(6))
+
+
+def test_completeness_check_runs_off_event_loop(fake_pdf, monkeypatch):
+    threads = []
+
+    def complete(pages):
+        threads.append(threading.get_ident())
+        return len(pages) >= 2
+
+    monkeypatch.setattr(main, "document_complete", complete)
+
+    async def go():
+        loop_thread = threading.get_ident()
+        ticket = main.OCR_POOL.admit()
+        try:
+            out = await main.ocr_file_fanout(ticket, b"%PDF", "application/pdf")
+        finally:
+            ticket.close()
+        return loop_thread, out
+
+    loop_thread, out = asyncio.run(go())
+    assert out["pages_processed"] == 2
+    assert threads and loop_thread not in threads
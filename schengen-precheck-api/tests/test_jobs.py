@@ -0,0 +1,82 @@
+import asyncio
+
+import bench
+import main
+
+
+class FakeTicket:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_cancelled_job_expires_and_wakes_streams():
+    async def scenario():
+        store = main.JobStore(4)
+        assert store.reserve()
+        job = store.create(1)
+        ticket = FakeTicket()
+        never = asyncio.ensure_future(asyncio.sleep(3600))
+        job.runner = asyncio.ensure_future(main.run_job(job, ticket, [never], 0.0))
+        waiter = asyncio.ensure_future(job.wait_events(0))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        job.runner.cancel()
+        events = await asyncio.wait_for(waiter, 1.0)
+        await asyncio.gather(job.runner, return_exceptions=True)
+        return job, ticket, never, events
+
+    job, ticket, never, events = asyncio.run(scenario())
+    assert job.status == "cancelled" and job.finished
+    assert job.expires_at is not None
+    assert events[-1]["event"] == "done" and events[-1]["data"]["status"] == "cancelled"
+    assert never.cancelled() and ticket.closed
+
+
+def test_reservations_count_against_job_max():
+    store = main.JobStore(2)
+    assert store.reserve() and store.reserve()
+    # Yüklemesi süren iki istek yeri tutar
+    assert not store.reserve()
+    store.release()
+    assert store.reserve()
+    store.create(1)
+    store.create(1)
+    assert len(store) == 2 and not store.reserve()
+
+
+def test_concurrent_posts_cannot_exceed_job_max(monkeypatch):
+    monkeypatch.setattr(main, "JOBS", main.JobStore(1))
+    admitted = []
+
+    async def slow_upload(request, ticket):
+        # Gövde okunurken diğer istek de gelir
+        await asyncio.sleep(0.05)
+        admitted.append(1)
+        return []
+
+    monkeypatch.setattr(main, "start_analysis", slow_upload)
+
+    async def scenario():
+        body, ctype = bench.multipart_body([("a.pdf", b"%PDF-1.4", "application/pdf")])
+        return await asyncio.gather(*(bench._asgi_post("/jobs", body, ctype) for _ in range(3)))
+
+    statuses = sorted(status for status, _ in asyncio.run(scenario()))
+    assert statuses == [202, 429, 429]
+    assert len(admitted) == 1
+
+
+def test_failed_upload_releases_reservation(monkeypatch):
+    monkeypatch.setattr(main, "JOBS", main.JobStore(1))
+
+    async def bad_upload(request, ticket):
+        raise main.HTTPException(status_code=400, detail="bad upload")
+
+    monkeypatch.setattr(main, "start_analysis", bad_upload)
+    body, ctype = bench.multipart_body([("a.pdf", b"%PDF-1.4", "application/pdf")])
+    status, _ = asyncio.run(bench._asgi_post("/jobs", body, ctype))
+    assert status == 400
+    assert main.JOBS.reserve()
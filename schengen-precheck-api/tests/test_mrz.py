@@ -0,0 +1,60 @@
+import main
+
+# ICAO 9303 Part 4 örnek pasaportu (Utopia, ERIKSSON ANNA MARIA)
+LINE1 = "P<UTOERIKSSON<<ANNA<MARIA<<<<<<<<<<<<<<<<<<<"
+LINE2 = "L898902C36UTO7408122F1204159ZE184226B<<<<<10"
+
+
+def test_check_digits_on_icao_specimen():
+    assert main.mrz_check_digit("L898902C3") == 6
+    assert main.mrz_check_digit("740812") == 2
+    assert main.mrz_check_digit("120415") == 9
+    assert main.mrz_check_digit("ZE184226B<<<<<") == 1
+    composite = LINE2[0:10] + LINE2[13:20] + LINE2[21:43]
+    assert main.mrz_check_digit(composite) == 0
+
+
+def test_parse_icao_specimen():
+    mrz = main.parse_td3_mrz(LINE2, LINE1)
+    assert mrz["valid"] and all(mrz["checks"].values())
+    assert mrz["document_type"] == "P" and mrz["issuing_state"] == "UTO"
+    assert mrz["document_number"] == "L898902C3"
+    assert mrz["nationality"] == "UTO" and mrz["sex"] == "F"
+    assert mrz["birth_date"].date().isoformat() == "1974-08-12"
+    assert mrz["expiry_date"].date().isoformat() == "2012-04-15"
+
+
+def test_letters_in_date_and_check_fields_are_fixed():
+    # OCR: tarihlerde 0 -> O, check digit 1 -> I
+    ocr = LINE2[:13] + "74O812" + LINE2[19:21] + "12O4I5" + LINE2[27:42] + "I" + LINE2[43:]
+    mrz = main.parse_td3_mrz(ocr, LINE1)
+    assert mrz["valid"]
+    assert mrz["birth_date"].date().isoformat() == "1974-08-12"
+    assert mrz["expiry_date"].date().isoformat() == "2012-04-15"
+    # Belge numarası alfanümerik: orada düzeltme yapılmaz
+    broken = "L8989O2C3" + LINE2[9:]
+    assert not main.parse_td3_mrz(broken, LINE1)["checks"]["document_number"]
+
+
+def test_joined_88_character_line_is_split():
+    text = "PASSPORT\n" + LINE1[:20] + " " + LINE1[20:] + LINE2 + "\n"
+    mrz = main.find_td3_mrz(text)
+    assert mrz is not None and mrz["valid"]
+    assert mrz["issuing_state"] == "UTO" and mrz["document_number"] == "L898902C3"
+
+
+def test_filler_lookalikes_are_cleaned():
+    text = LINE1.replace("<<<<", "«<<(") + "\n" + LINE2.replace("<<<<<", "<<‹<<") + "\n"
+    mrz = main.find_td3_mrz(text)
+    assert mrz is not None and mrz["valid"]
+
+
+def test_44_character_body_line_is_rejected():
+    body = "THE INSURED PERSON IS COVERED IN ALL SCHENGEN"
+    assert len(body.replace(" ", "")) <= 44
+    letters = "POLICYNUMBERTR2026SCHENGENCOVERAGETHIRTYKEUR"
+    assert len(letters) == 44
+    assert main.find_td3_mrz(body) is None
+    assert main.find_td3_mrz(letters) is None
+    assert main.find_td3_mrz(body + "\n" + letters) is None
+    assert not main.looks_like_mrz(body + "\n" + letters)
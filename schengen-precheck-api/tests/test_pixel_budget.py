@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import main
+
+
+@pytest.fixture
+def full_budget(monkeypatch):
+    # Bütçenin tamamı başka bir sayfada: yeni ayırmalar beklemek zorunda
+    budget = main.PixelBudget(100)
+    monkeypatch.setattr(main, "PIXEL_BUDGET", budget)
+    hold = budget.reserve(100)
+    hold.__enter__()
+    yield budget
+    hold.__exit__(None, None, None)
+
+
+def reserve_some():
+    with main.PIXEL_BUDGET.reserve(50):
+        return "reserved"
+
+
+def test_wait_is_bounded_by_request_deadline(full_budget):
+    t0 = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        main.run_pool_job(time.time() + 0.1, None, reserve_some)
+    # OCR_TIMEOUT_S değil, isteğin kalan süresi kadar beklendi
+    assert time.perf_counter() - t0 < 1.0
+    assert full_budget.waiting == 0
+
+
+def test_cancel_ends_wait_immediately(full_budget):
+    cancelled = threading.Event()
+    outcome = []
+
+    def worker():
+        try:
+            main.run_pool_job(time.time() + 30, cancelled, reserve_some)
+        except asyncio.TimeoutError:
+            outcome.append("gave_up")
+
+    t = threading.Thread(target=worker)
+    t.start()
+    while full_budget.waiting == 0:
+        time.sleep(0.005)
+    t0 = time.perf_counter()
+    cancelled.set()
+    full_budget.wake()
+    t.join(timeout=2)
+    assert outcome == ["gave_up"] and time.perf_counter() - t0 < 0.5
+
+
+def test_already_cancelled_job_does_not_reserve(full_budget):
+    cancelled = threading.Event()
+    cancelled.set()
+    t0 = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        main.run_pool_job(time.time() + 30, cancelled, reserve_some)
+    assert time.perf_counter() - t0 < 0.1
+    assert full_budget.used == 100
+
+
+def test_ticket_timeout_releases_waiting_worker(full_budget):
+    pool = main.OcrWorkerPool("thread", 1, 4)
+
+    async def scenario():
+        ticket = pool.admit(timeout_s=0.1)
+        with pytest.raises(asyncio.TimeoutError):
+            await ticket.run(reserve_some)
+        ticket.close()
+
+    try:
+        asyncio.run(scenario())
+        # Worker thread'i bütçede 30 s (OCR_TIMEOUT_S) beklemeden bıraktı
+        deadline = time.monotonic() + 1.0
+        while (full_budget.waiting or pool.pending) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert full_budget.waiting == 0
+        assert pool.pending == 0
+    finally:
+        pool.shutdown()
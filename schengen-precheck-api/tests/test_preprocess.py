@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+import bench
+import main
+
+
+@pytest.fixture(scope="module")
+def page():
+    # 300 DPI yerine 150 DPI: aynı içerik, test süresi kısa
+    return bench.synthetic_a4_page(dpi=150)
+
+
+def run(monkeypatch, profile, img, mode, threshold="fixed"):
+    monkeypatch.setattr(main, "OCR_PREPROCESS", mode)
+    monkeypatch.setattr(main, "OCR_THRESHOLD", threshold)
+    return np.asarray(main.PREPROCESS_PROFILES[profile](img))
+
+
+@pytest.mark.parametrize("profile", sorted(main.PREPROCESS_PROFILES))
+def test_numpy_matches_pil_within_tolerance(monkeypatch, page, profile):
+    ref = run(monkeypatch, profile, page, "pil")
+    out = run(monkeypatch, profile, page, "numpy")
+    assert ref.shape == out.shape
+    assert float((ref != out).mean()) <= bench.PREPROCESS_TOLERANCE
+
+
+@pytest.mark.parametrize("method", ["otsu", "sauvola"])
+def test_adaptive_thresholds_binarise(monkeypatch, page, method):
+    img = main.PREPROCESS_PROFILES["mrz"]
+    monkeypatch.setattr(main, "OCR_PREPROCESS", "numpy")
+    monkeypatch.setattr(main, "OCR_THRESHOLD", method)
+    out = img(page)
+    assert out.mode == "1"
+    # Metin pikselleri siyah, zemin beyaz kalır
+    black = float((~np.asarray(out)).mean())
+    assert 0.0 < black < 0.5
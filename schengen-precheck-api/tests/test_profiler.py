@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import main
+
+
+def sampled_work():
+    end = time.monotonic() + 0.3
+    while time.monotonic() < end:
+        time.sleep(0.002)
+
+
+def other_work():
+    end = time.monotonic() + 0.3
+    while time.monotonic() < end:
+        time.sleep(0.002)
+
+
+def test_only_sampled_request_workers_are_sampled(monkeypatch):
+    profiler = main.SamplingProfiler(1.0, 0.005, 1000)
+    monkeypatch.setattr(main, "PROFILER", profiler)
+    pool = main.OcrWorkerPool("thread", 2, 4)
+
+    async def unsampled():
+        ticket = pool.admit()
+        try:
+            await ticket.run(other_work)
+        finally:
+            ticket.close()
+
+    async def sampled():
+        with profiler.request():
+            ticket = pool.admit()
+            try:
+                await ticket.run(sampled_work)
+            finally:
+                ticket.close()
+
+    async def scenario():
+        await asyncio.gather(unsampled(), sampled())
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    folded = profiler.folded()
+    assert profiler.samples > 0
+    assert "ocr-worker" in folded and "sampled_work" in folded
+    assert "other_work" not in folded
+    assert not profiler.profiling()
@@ -0,0 +1,87 @@
+import copy
+import json
+import time
+
+import pytest
+
+import main
+
+PASSPORT_TEXT = (
+    "PASAPORT / PASSPORT\n"
+    "Date of birth 12.05.1990\n"
+    "Date of issue 01.02.2020\n"
+    "Date of expiry 01.02.2030\n"
+    "P<TURYILMAZ<<AYSE<<<<<<<<<<<<<<<<<<<<<<<<<<\n"
+)
+
+
+def _passport_result():
+    page = {"page": 1, "method": "ocr", "text": PASSPORT_TEXT, "ocr_passes": ["page:eng:psm6"]}
+    ocr_out = {"text": PASSPORT_TEXT, "pages_processed": 1, "pages_total": 1, "pages": [page]}
+    meta = main._safe_meta("pasaport.pdf", "application/pdf", 0.1)
+    fr = main.analyze_file(meta, ocr_out)
+    fr["cache_hit"] = False
+    return fr
+
+
+def _keys(obj):
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            yield k
+            yield from _keys(v)
+    elif isinstance(obj, list):
+        for v in obj:
+            yield from _keys(v)
+
+
+def test_full_result_has_debug_fields():
+    fr = _passport_result()
+    assert fr["doc_type"] == "passport"
+    assert set(main.DEBUG_FIELDS) <= set(fr["fields"])
+
+
+@pytest.mark.parametrize("profile", ["minimal", "standard"])
+def test_slim_profiles_have_no_debug_fields_or_text(profile):
+    fr = main.shape_file_result(_passport_result(), profile, timings=False)
+    body = json.loads(main.encode_json(main.summarize_analysis([fr], time.time())))
+    keys = set(_keys(body))
+    assert not keys & set(main.DEBUG_FIELDS)
+    assert "text" not in keys
+    assert "YILMAZ" not in json.dumps(body)
+
+
+def test_debug_profile_keeps_everything():
+    fr = main.shape_file_result(_passport_result(), "debug", timings=False)
+    assert fr["pages"][0]["text"] == PASSPORT_TEXT
+    assert "text_preview" in fr["llm_payload_preview"]["fields"]
+
+
+def test_shaping_does_not_touch_cacheable_result():
+    fr = _passport_result()
+    cached = main.cacheable_result(fr)
+    main.shape_file_result(copy.deepcopy(fr), "minimal", timings=False)
+    assert cached == main.cacheable_result(fr)
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_encode_json_paths_agree(monkeypatch, fast):
+    if fast and main.orjson is None:
+        pytest.skip("orjson not installed")
+    if not fast:
+        monkeypatch.setattr(main, "orjson", None)
+    payload = {
+        "when": main.datetime(2030, 2, 1, 12, 0),
+        "tags": {"mrz"},
+        "score": main.np.float32(0.5),
+        "count": main.np.int64(3),
+        "text": "Türkçe ğüşiöç",
+        1: "non-str key",
+    }
+    assert json.loads(main.encode_json(payload)) == {
+        "when": "2030-02-01T12:00:00",
+        "tags": ["mrz"],
+        "score": 0.5,
+        "count": 3,
+        "text": "Türkçe ğüşiöç",
+        "1": "non-str key",
+    }
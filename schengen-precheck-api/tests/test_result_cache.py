@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import main
+
+
+class SlowBackend(main.CacheBackend):
+    """Paylaşılan depo gibi davranır; her erişim `delay_s` bekler."""
+
+    name = "slow"
+    shared = False  # şifreleme gerekmesin; paylaşım davranışı aşağıda açılır
+
+    def __init__(self, delay_s=0.0, fail=False):
+        self.delay_s = delay_s
+        self.fail = fail
+        self.items = {}
+        self.threads = set()
+
+    def _wait(self):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay_s)
+        if self.fail:
+            raise ConnectionError("cache down")
+
+    def get(self, key):
+        self._wait()
+        return self.items.get(key)
+
+    def set(self, key, value, ttl_s):
+        self._wait()
+        self.items[key] = value
+
+
+def shared_cache(backend):
+    cache = main.ResultCache(backend, 60, b"secret")
+    backend.shared = True
+    return cache
+
+
+def test_shared_backend_runs_off_event_loop():
+    backend = SlowBackend(delay_s=0.1)
+    cache = shared_cache(backend)
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        t = asyncio.create_task(ticker())
+        await cache.aput("k", {"doc_type": "passport"})
+        value = await cache.aget("k")
+        t.cancel()
+        return value, ticks
+
+    value, ticks = asyncio.run(scenario())
+    assert value == {"doc_type": "passport"}
+    # Depo 0.2 s beklerken loop başka işleri yürütmeye devam etti
+    assert ticks >= 5
+    assert threading.get_ident() not in backend.threads
+
+
+def test_backend_error_is_a_miss():
+    cache = shared_cache(SlowBackend(fail=True))
+    assert asyncio.run(cache.aget("k")) is None
+    asyncio.run(cache.aput("k", {"doc_type": "passport"}))
+    assert cache.errors == 2 and cache.misses == 1
+
+
+def test_backend_timeout_is_a_miss(monkeypatch):
+    monkeypatch.setattr(main, "RESULT_CACHE_TIMEOUT_S", 0.02)
+    cache = shared_cache(SlowBackend(delay_s=0.5))
+
+    async def scenario():
+        t0 = time.perf_counter()
+        value = await cache.aget("k")
+        return value, time.perf_counter() - t0
+
+    value, waited = asyncio.run(scenario())
+    assert value is None and waited < 0.5
+    # asyncio.run, geciken thread bitene kadar bekler: o da sayım yapmamalı
+    assert (cache.hits, cache.misses, cache.errors) == (0, 1, 1)
+
+
+def test_stats_run_off_event_loop():
+    backend = SlowBackend()
+    seen = []
+    backend.stats = lambda: seen.append(threading.get_ident()) or {"entries": 7}
+    cache = shared_cache(backend)
+
+    async def scenario():
+        return threading.get_ident(), await cache.astats()
+
+    loop_thread, stats = asyncio.run(scenario())
+    assert stats["entries"] == 7 and stats["backend"] == "slow"
+    assert seen and loop_thread not in seen
+
+
+def test_sqlite_backend_roundtrip(tmp_path):
+    pytest.importorskip("cryptography")
+    backend = main.SqliteCacheBackend(str(tmp_path / "cache.sqlite"), 8)
+    cache = main.ResultCache(backend, 60, b"secret")
+
+    async def scenario():
+        await cache.aput("k", {"doc_type": "bank_statement"})
+        return await cache.aget("k")
+
+    assert asyncio.run(scenario()) == {"doc_type": "bank_statement"}
+
+
+def test_redis_client_has_timeouts():
+    pytest.importorskip("redis")
+    backend = main.RedisCacheBackend("redis://127.0.0.1:1/0", timeout_s=0.25)
+    kwargs = backend._client.connection_pool.connection_kwargs
+    assert kwargs["socket_timeout"] == 0.25
+    assert kwargs["socket_connect_timeout"] == 0.25
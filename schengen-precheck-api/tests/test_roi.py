@@ -0,0 +1,180 @@
+from datetime import datetime
+
+import fitz
+import pytest
+
+import bench
+import main
+
+MRZ = bench.synthetic_mrz(datetime(2031, 1, 15))
+INSURANCE_TEXT = (
+    "SEYAHAT SAGLIK SIGORTASI / TRAVEL HEALTH INSURANCE\n"
+    "Policy valid in all Schengen countries, coverage 30.000 EUR\n"
+    "Start date 01.06.2026 End date 30.06.2026\n"
+)
+
+
+def new_page():
+    doc = fitz.open()
+    return doc, doc.new_page(width=595, height=842)
+
+
+def write_lines(page, lines, top, pitch=20, size=11, font="helv", left=50):
+    for k, line in enumerate(lines):
+        page.insert_text((left, top + k * pitch), line, fontsize=size, fontname=font)
+
+
+def body_lines(n):
+    return [f"Satir {k}: hesap hareketi aciklamasi tutar 1.250,00 TRY bakiye {k}" for k in range(n)]
+
+
+def regions(page):
+    return main.detect_text_regions(page)["regions"]
+
+
+class FakeEngine:
+    """Bölgeye bakmadan sabit metin döndürür; MRZ geçişinde (PSM 11) ayrı metin verebilir."""
+
+    name = "fake"
+
+    def __init__(self, text, mrz_text=None):
+        self.text = text
+        self.mrz_text = mrz_text if mrz_text is not None else text
+        self.calls = 0
+
+    def image_to_string(self, img, lang, psm):
+        self.calls += 1
+        return self.mrz_text if psm == 11 else self.text
+
+
+def test_lines_at_normal_leading_form_one_block():
+    doc, page = new_page()
+    write_lines(page, body_lines(15), top=80)
+    got = regions(page)
+    assert [g["kind"] for g in got] == ["text"]
+
+
+def test_paragraphs_separated_by_blank_space_stay_apart():
+    doc, page = new_page()
+    write_lines(page, body_lines(4), top=200)
+    write_lines(page, body_lines(4), top=400)
+    assert [g["kind"] for g in regions(page)] == ["text", "text"]
+
+
+def test_passport_mrz_lines_are_one_candidate_region():
+    doc, page = new_page()
+    write_lines(page, ["PASAPORT / PASSPORT", "Surname / Soyadi: DOE", "Date of expiry 15.01.2031"], top=120)
+    write_lines(page, list(MRZ), top=760, pitch=22, size=12.5, font="cour", left=30)
+    got = regions(page)
+    mrz = [g for g in got if g["kind"] == "mrz"]
+    assert len(got) == 2 and len(mrz) == 1
+    # İki MRZ satırı tek bölgede
+    assert mrz[0]["bbox"][1] < 760 - 8 and mrz[0]["bbox"][3] > 782
+
+
+def test_side_by_side_columns_merge_into_table():
+    doc, page = new_page()
+    for row in range(5):
+        for col, left in enumerate((50, 250, 450)):
+            page.insert_text((left, 300 + row * 18), f"0{row + 1}.03.2026  {col * 100 + row},00", fontsize=10)
+    assert [g["kind"] for g in regions(page)] == ["table"]
+
+
+def test_photo_block_is_skipped():
+    doc, page = new_page()
+    page.draw_rect(fitz.Rect(400, 100, 540, 280), color=(0.1, 0.1, 0.1), fill=(0.15, 0.15, 0.15))
+    write_lines(page, body_lines(3), top=400)
+    got = regions(page)
+    assert len(got) == 1 and got[0]["bbox"][1] > 300
+
+
+def test_looks_like_mrz():
+    assert main.looks_like_mrz("\n".join(MRZ))
+    assert main.looks_like_mrz("".join(MRZ))
+    assert not main.looks_like_mrz(INSURANCE_TEXT)
+    assert not main.looks_like_mrz("POLICY NUMBER 1234567890 SCHENGEN COVERAGE 30000 EUR VALID\nINSURED PERSON JOHN DOE BORN 01 01 1990 TURKEY ISTANBUL")
+
+
+@pytest.fixture
+def fake_engine(monkeypatch):
+    def install(engine):
+        monkeypatch.setattr(main, "get_ocr_engine", lambda: engine)
+        return engine
+    return install
+
+
+def test_wide_body_lines_are_not_labelled_mrz(fake_engine):
+    doc, page = new_page()
+    write_lines(page, ["TRAVEL HEALTH INSURANCE"], top=60, size=14)
+    # İki geniş, eşit uzunlukta gövde satırı: geometrik MRZ adayı olabilir
+    write_lines(page, [
+        "Policy valid in all Schengen countries with coverage of 30.000 EUR per person",
+        "Start date 01.06.2026 and end date 30.06.2026 for the insured traveller here",
+    ], top=600, pitch=18, size=10.5)
+    engine = fake_engine(FakeEngine(INSURANCE_TEXT))
+    plan = main.plan_page_render(page)
+    layout = main.detect_text_regions(page)
+    main.ocr_pdf_regions(page, plan, layout)
+    assert all(g["kind"] != "mrz" for g in layout["regions"])
+    assert engine.calls >= len(layout["regions"])
+
+
+def test_mrz_region_confirmed_by_text(fake_engine):
+    doc, page = new_page()
+    write_lines(page, ["PASAPORT / PASSPORT", "Date of expiry 15.01.2031"], top=120)
+    write_lines(page, list(MRZ), top=760, pitch=22, size=12.5, font="cour", left=30)
+    fake_engine(FakeEngine("PASAPORT / PASSPORT", mrz_text="\n".join(MRZ)))
+    out = main.ocr_pdf_regions(page, main.plan_page_render(page), main.detect_text_regions(page))
+    assert out is not None and out["method"] == "ocr_roi"
+    assert out["mrz"]["valid"] and out["mrz"]["expiry_date"] == "2031-01-15"
+    assert [g["kind"] for g in out["regions"]] == ["text", "mrz"]
+
+
+def test_many_regions_are_rejected_by_engine_cost(fake_engine):
+    doc, page = new_page()
+    for k in range(12):
+        write_lines(page, [f"Madde {k}: kisa satir"], top=60 + k * 62)
+    plan = main.plan_page_render(page)
+    layout = main.detect_text_regions(page)
+    assert len(layout["regions"]) == 12
+
+    fake_engine(type("Engine", (), {"name": "pytesseract"})())
+    assert not main.roi_cost(page, plan, layout)["cheaper"]
+    fake_engine(type("Engine", (), {"name": "tesserocr"})())
+    assert main.roi_cost(page, plan, layout)["cheaper"]
+
+
+def test_probe_rendered_once_per_page(fake_engine, monkeypatch):
+    doc, page = new_page()
+    write_lines(page, ["PASAPORT / PASSPORT", "Date of expiry 15.01.2031"], top=120)
+    write_lines(page, list(MRZ), top=760, pitch=22, size=12.5, font="cour", left=30)
+    fake_engine(FakeEngine("PASAPORT / PASSPORT", mrz_text="\n".join(MRZ)))
+    calls = []
+    real = main.probe_gray
+    monkeypatch.setattr(main, "probe_gray", lambda p: calls.append(1) or real(p))
+    out = main.ocr_pdf_page(page)
+    assert out["method"] == "ocr_roi"
+    assert len(calls) == 1
+
+
+class NoTurkishEngine(FakeEngine):
+    """Türkçe dil paketi kurulu olmayan host: "tur" içeren geçişler hata verir."""
+
+    def image_to_string(self, img, lang, psm):
+        if "tur" in lang.split("+"):
+            raise RuntimeError("Failed loading language 'tur'")
+        return super().image_to_string(img, lang, psm)
+
+
+def test_roi_falls_back_to_eng_without_turkish_pack(fake_engine, monkeypatch):
+    monkeypatch.setattr(main, "OCR_LANG_MODE", "combined")
+    doc, page = new_page()
+    write_lines(page, ["PASAPORT / PASSPORT", "Date of expiry 15.01.2031"], top=120)
+    write_lines(page, list(MRZ), top=760, pitch=22, size=12.5, font="cour", left=30)
+    fake_engine(NoTurkishEngine("PASAPORT / PASSPORT", mrz_text="\n".join(MRZ)))
+    assert main.roi_pass("text")[1] == "eng+tur"
+
+    out = main.ocr_pdf_page(page)
+    assert out["method"] == "ocr_roi"
+    assert out["mrz"]["valid"]
+    assert all(":eng:" in p for p in out["ocr_passes"])
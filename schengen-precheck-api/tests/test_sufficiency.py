@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import bench
+import main
+
+HEADER = "PASAPORT / PASSPORT\nREPUBLIC OF TURKIYE\nSurname / Soyadi: DOE\n"
+
+
+def passport_fields(text):
+    return main.extract_fields_by_type("passport", text, [])
+
+
+def test_unanchored_date_does_not_stop_passes():
+    # Yalnızca doğum / veriliş tarihi: yedek en büyük tarih expiry_candidate olur
+    text = HEADER + "Date of birth 12.05.1990\nDate of issue 01.02.2020\n"
+    assert main.score_doc_types(text)["passport"] >= main.CONFIDENCE_THRESHOLD
+    fields = passport_fields(text)
+    assert fields["expiry_candidate"] == "2020-02-01"
+    assert fields["expiry_anchored"] is False
+    assert not main.ocr_text_sufficient(text)
+
+
+def test_keyword_anchored_expiry_is_sufficient():
+    text = HEADER + "Date of birth 12.05.1990\nDate of expiry 01.02.2030\n"
+    fields = passport_fields(text)
+    assert fields["expiry_candidate"] == "2030-02-01" and fields["expiry_anchored"]
+    assert main.ocr_text_sufficient(text)
+
+
+def test_mrz_validated_expiry_is_sufficient():
+    text = HEADER + "\n".join(bench.synthetic_mrz(datetime(2031, 4, 15))) + "\n"
+    fields = passport_fields(text)
+    assert fields["mrz"]["valid"] and fields["expiry_anchored"]
+    assert main.ocr_text_sufficient(text)
+
+
+def test_broken_mrz_check_digits_are_not_sufficient():
+    line1, line2 = bench.synthetic_mrz(datetime(2031, 4, 15))
+    # Geçerlilik tarihini bozup check digit'i tutmaz hale getir
+    line2 = line2[:21] + "350415" + line2[27:]
+    text = HEADER + "Date of birth 01.01.1990\n" + line1 + "\n" + line2 + "\n"
+    fields = passport_fields(text)
+    assert fields["expiry_candidate"] is not None
+    assert fields["expiry_anchored"] is False
+    assert not main.ocr_text_sufficient(text)
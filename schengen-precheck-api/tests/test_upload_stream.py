@@ -0,0 +1,135 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import HTTPException
+
+import bench
+import main
+
+PDF = b"%PDF-1.4\n" + b"x" * 300
+PNG = b"\x89PNG\r\n\x1a\n" + b"y" * 200
+
+
+def body_of(files, fields=()):
+    boundary = "testboundary"
+    parts = []
+    for name, value in fields:
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n".encode()
+            + value + b"\r\n"
+        )
+    body, ctype = bench.multipart_body(files, boundary)
+    return b"".join(parts) + body, ctype
+
+
+def feed(body, chunk=7):
+    got = []
+    stream = main.UploadStream(b"testboundary", lambda meta, data, ctype: got.append((meta, data, ctype)))
+    for i in range(0, len(body), chunk):
+        stream.write(body[i:i + chunk])
+    stream.finalize()
+    return stream, got
+
+
+def test_files_are_parsed_across_small_chunks():
+    body, _ = body_of([("a.pdf", PDF, "application/pdf"), ("b.png", PNG, "image/png")], [("note", b"ignored")])
+    stream, got = feed(body)
+    assert stream.files == 2
+    assert [(m["filename"], c) for m, _, c in got] == [("a.pdf", "application/pdf"), ("b.png", "image/png")]
+    assert [bytes(d) for _, d, _ in got] == [PDF, PNG]
+    # Tampon kopyalanmadan devredilir
+    assert all(isinstance(d, bytearray) for _, d, _ in got)
+
+
+def test_type_is_sniffed_not_declared():
+    # Uzantı / Content-Type PDF diyor ama içerik değil: ilk baytlarda 415
+    body, _ = body_of([("fake.pdf", b"MZ\x90\x00" + b"z" * 500, "application/pdf")])
+    with pytest.raises(HTTPException) as e:
+        feed(body)
+    assert e.value.status_code == 415 and "fake.pdf" in e.value.detail
+
+
+def test_declared_type_does_not_matter_for_real_content():
+    body, _ = body_of([("scan.bin", PNG, "application/octet-stream")])
+    _, got = feed(body)
+    assert got[0][2] == "image/png"
+
+
+def test_file_over_limit_is_rejected_while_streaming(monkeypatch):
+    monkeypatch.setattr(main, "MAX_FILE_MB", 0.0002)  # ~210 bayt
+    body, _ = body_of([("big.pdf", PDF, "application/pdf")])
+    with pytest.raises(HTTPException) as e:
+        feed(body)
+    assert e.value.status_code == 413 and "big.pdf" in e.value.detail
+
+
+def test_too_many_files(monkeypatch):
+    monkeypatch.setattr(main, "MAX_FILES_PER_REQUEST", 2)
+    body, _ = body_of([(f"{i}.pdf", PDF, "application/pdf") for i in range(3)])
+    with pytest.raises(HTTPException) as e:
+        feed(body)
+    assert e.value.status_code == 413 and "Too many files" in e.value.detail
+
+
+async def _post(body, headers, chunk=64):
+    # Content-Length'siz (chunked) gönderim için parça parça receive
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/analyze", "raw_path": b"/analyze",
+        "query_string": b"", "root_path": "", "client": ("127.0.0.1", 0), "server": ("127.0.0.1", 8000),
+        "headers": [(k.encode(), v.encode()) for k, v in headers.items()],
+    }
+    chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)] or [b""]
+
+    async def receive():
+        if chunks:
+            part = chunks.pop(0)
+            return {"type": "http.request", "body": part, "more_body": bool(chunks)}
+        return {"type": "http.disconnect"}
+
+    out = {"status": 0, "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            out["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            out["body"] += message.get("body", b"")
+
+    await main.app(scope, receive, send)
+    return out["status"], json.loads(out["body"] or b"{}")
+
+
+def post(body, headers):
+    return asyncio.run(_post(body, headers))
+
+
+def test_non_multipart_is_400():
+    status, resp = post(b"{}", {"content-type": "application/json"})
+    assert status == 400 and "multipart" in resp["detail"]
+
+
+def test_request_over_limit_by_content_length(monkeypatch):
+    monkeypatch.setattr(main, "MAX_REQUEST_MB", 0.0001)
+    body, ctype = body_of([("a.pdf", PDF, "application/pdf")])
+    status, resp = post(body, {"content-type": ctype, "content-length": str(len(body))})
+    assert status == 413 and "Request too large" in resp["detail"]
+
+
+def test_request_over_limit_while_streaming(monkeypatch):
+    monkeypatch.setattr(main, "MAX_REQUEST_MB", 0.0001)
+    body, ctype = body_of([("a.pdf", PDF, "application/pdf")])
+    status, resp = post(body, {"content-type": ctype})
+    assert status == 413 and "Request too large" in resp["detail"]
+
+
+def test_unsupported_file_is_415_at_endpoint():
+    body, ctype = body_of([("x.pdf", b"GIF89a" + b"0" * 100, "application/pdf")])
+    status, resp = post(body, {"content-type": ctype})
+    assert status == 415
+
+
+def test_no_files_is_400():
+    body = b"--testboundary\r\nContent-Disposition: form-data; name=\"note\"\r\n\r\nhi\r\n--testboundary--\r\n"
+    status, resp = post(body, {"content-type": "multipart/form-data; boundary=testboundary"})
+    assert status == 400 and resp["detail"] == "No files provided"